@@ -8,9 +8,15 @@ Uses BERT for entity detection and regex for structure parsing and validation.
 import pandas as pd
 import re
 import json
+import os
 import unicodedata
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
 from bs4 import BeautifulSoup
 from transformers import pipeline
+from ner_cache import SpanCache, to_cacheable
+from line_dedup import LRUSet, BloomFilter
+from extractors import RESULT_SCHEMA
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -19,29 +25,67 @@ warnings.filterwarnings('ignore')
 # ============================================================================
 
 class HybridNERProcessor:
-    def __init__(self):
-        """Initialize BERT model and regex patterns"""
+    REGEX_ONLY_TYPES = ("studies", "corporate")
+    DEDUP_SCOPES = ("document", "lru", "bloom")
+    
+    MODEL_NAME = "dbmdz/bert-large-cased-finetuned-conll03-english"
+    
+    # Canonical forms of known organization spellings (keys are canon() output)
+    ALIASES = {
+        "g.e.": "ge",
+        "mac tac": "mactac", 
+        "pc componentes": "pccomponentes",
+        "ie": "ie business school"
+    }
+    
+    def __init__(self, batch_size=16, regex_only_types=(), cache_path=None, cache_size=200_000,
+                 dedup_scope="document", dedup_max_lines=100_000, dedup_fp_rate=0.01, load_model=True):
+        """Initialize BERT model and regex patterns
+        
+        Args:
+            batch_size: Lines per BERT forward pass when processing line lists
+            regex_only_types: Line types ("studies", "corporate") extracted from
+                regex structure alone, without running BERT
+            cache_path: SQLite file for the persistent span cache (None = no cache)
+            cache_size: Maximum number of lines kept in the span cache
+            dedup_scope: "document" drops repeated lines within one biography;
+                "lru" / "bloom" also drop lines seen in earlier biographies,
+                remembering about the last dedup_max_lines of them
+            dedup_fp_rate: Bloom filter false-positive rate ("bloom" scope)
+            load_model: Set False to use only the regex/line utilities (no BERT)
+        """
         print("Loading NER model...")
         
         # BERT NER Pipeline
         self.ner_pipeline = pipeline(
             "ner", 
-            model="dbmdz/bert-large-cased-finetuned-conll03-english",
+            model=self.MODEL_NAME,
             aggregation_strategy="simple"
-        )
+        ) if load_model else None
         self.MIN_SCORE = 0.85  # Confidence threshold
+        self.batch_size = batch_size
+        
+        unknown = set(regex_only_types) - set(self.REGEX_ONLY_TYPES)
+        if unknown:
+            raise ValueError(f"regex_only_types must be among {self.REGEX_ONLY_TYPES}, got {sorted(unknown)}")
+        self.regex_only_types = set(regex_only_types)
+        
+        # Persistent span cache (optional)
+        self.span_cache = SpanCache(cache_path, cache_size) if cache_path else None
         
         # Initialize regex patterns
         self._init_regex_patterns()
         
-        # Initialize aliases and seen lines tracker
-        self.ALIASES = {
-            "g.e.": "ge",
-            "mac tac": "mactac", 
-            "pc componentes": "pccomponentes",
-            "ie": "ie business school"
-        }
-        self.seen_lines = set()
+        # Initialize seen lines tracker
+        if dedup_scope not in self.DEDUP_SCOPES:
+            raise ValueError(f"dedup_scope must be one of {self.DEDUP_SCOPES}, got {dedup_scope!r}")
+        self.dedup_scope = dedup_scope
+        if dedup_scope == "lru":
+            self.seen_lines = LRUSet(dedup_max_lines)
+        elif dedup_scope == "bloom":
+            self.seen_lines = BloomFilter(dedup_max_lines, dedup_fp_rate)
+        else:
+            self.seen_lines = None  # fresh set per document
         
         print("NER model loaded!")
     
@@ -49,7 +93,7 @@ class HybridNERProcessor:
         """Initialize all regex patterns used for entity extraction"""
         
         # DEGREE PATTERNS
-        self.DEGREE = re.compile(r"""(?ix)
+        degree_pattern = r"""
             \b(
                 ph\.?\s*d\.?           |  # PhD, Ph.D., Ph D
                 m\.?\s*b\.?\s*a\.?     |  # MBA, M.B.A., M B A
@@ -64,7 +108,8 @@ class HybridNERProcessor:
                 (?:master(?:'s|s)?\s+(?:of|in)\s+[^,;]+)   |
                 industrial\s+engineer
             )\b
-        """)
+        """
+        self.DEGREE = re.compile(r"(?ix)" + degree_pattern)
         
         # YEAR PATTERNS (handles ranges like "2020-Present")
         self.YEAR = re.compile(r"\b(19|20)\d{2}\b(?:\s*[–-]\s*(?:Present|\b(19|20)\d{2}\b))?", re.I)
@@ -80,6 +125,15 @@ class HybridNERProcessor:
         self.ROLE_WORDS = r"(Director|Manager|Partner|Analyst|CEO|CTO|Professor|Adjunct|Assistant|Fellow|Counsel|Engineer|Officer)"
         self.COURSE_HINTS = r"(Professor of|teaches|taught|Course|Courses|Program|curriculum)"
         
+        # Lowercase copies for matching against a pre-lowered line. Without
+        # IGNORECASE, re can skip ahead on literal prefixes, which makes these
+        # several times cheaper per line than the case-insensitive versions.
+        self.DEGREE_LC = re.compile(r"(?x)" + degree_pattern)
+        self.YEAR_LC = re.compile(r"\b(19|20)\d{2}\b(?:\s*[–-]\s*(?:present|\b(19|20)\d{2}\b))?")
+        self.UNI_WORD_LC = re.compile(r"\b(university|college|school|institute)\b")
+        self.COURSE_HINTS_LC = re.compile(self.COURSE_HINTS.lower())
+        self.ROLE_WORDS_LC = re.compile(self.ROLE_WORDS.lower())
+        
         # CORPORATE LINE STRUCTURE (Position, Company, Location, Years)
         self.CORP_LINE = re.compile(
             r"^\s*[^,]+,\s*[^,]+,\s*[^,]+(?:,\s*(?:\b(19|20)\d{2}\b(?:\s*[–-]\s*(?:Present|\b(19|20)\d{2}\b))?\s*))?$",
@@ -89,9 +143,29 @@ class HybridNERProcessor:
         # ORGANIZATION CONNECTORS (for merging BERT entities)
         self.CONNECT = re.compile(r"\s*(?:/|&|and|of|–|-|,)\s*", re.I)
         
+        # KNOWN COUNTRIES (location fallback when BERT finds none)
+        self.COUNTRY = re.compile(r"\b(USA|UK|U\.K\.|UAE|Spain|Belgium|Mexico|Colombia|Germany|France|Italy)\b", re.I)
+        
         # TEXT CLEANING PATTERNS
         self.LEGAL_SUFFIX = re.compile(r"\b(inc\.?|llc|ltd\.?|s\.?a\.?|gmbh|co\.|corp\.|company|ag|plc|s\.?r\.?l\.?)\b", re.I)
         self.NOISE = re.compile(r"[''\"()\-–—]")
+        self.AMPERSAND = re.compile(r"\s*&\s*")
+        self.MULTI_SPACE = re.compile(r"\s{2,}")
+        
+        # LINE SPLITTING
+        self.BULLET_SPLIT = re.compile(r'[•·]\s*')
+        self.SENTENCE_SPLIT = re.compile(r'[.!?]+')
+        
+        # VALIDATION BLACKLISTS
+        self.BAD_LOCATION = re.compile(r"\b(Studies|Science|Engineering|Business|Administration|Economics|Law|Design|Arts|Technology|Protocol|Initiative|Panel|Committee)\b", re.I)
+        self.BAD_COMPANY = re.compile(r"\b(Panel|Initiative|Committee|Board|where|a company|the|Expert|Experts|Digital|Economy)\b", re.I)
+        
+        # EXTRACTOR PATTERNS
+        self.COMMA_LINE = re.compile(r"^[^,]+,\s*[^,]+(?:,\s*[^,]+)*$")
+        self.COMMA_SEGMENT = re.compile(r"[^,]+")
+        self.COURSE_PHRASE = re.compile(r"(?:Professor of|teaches?|taught|lectures?\s+on)\s+(.+?)(?:\s+at\s+[^,.;]+)?(?:[,.;]|$)", re.I)
+        self.COURSE_SPLIT = re.compile(r"\s*(?:,| and | & )\s*")
+        self.TEACHING_INST = re.compile(r"\bat\s+([A-Z][^,.;]*(?:University|School|College|Institute))", re.I)
 
 # ============================================================================
 # SECTION 2: HTML PROCESSING & LINE EXTRACTION
@@ -112,14 +186,14 @@ class HybridNERProcessor:
                 
             # Split by bullet indicators if present
             if '•' in text or '·' in text:
-                bullet_splits = re.split(r'[•·]\s*', text)
+                bullet_splits = self.BULLET_SPLIT.split(text)
                 for bullet in bullet_splits:
                     bullet = bullet.strip()
                     if len(bullet) > 15:
                         lines.append(bullet)
             else:
                 # Split by sentences if no bullets
-                sentences = re.split(r'[.!?]+', text)
+                sentences = self.SENTENCE_SPLIT.split(text)
                 for sent in sentences:
                     sent = sent.strip()
                     if len(sent) > 15:
@@ -129,22 +203,26 @@ class HybridNERProcessor:
     
     def line_type(self, text):
         """Classify line type for targeted extraction"""
-        s = text.strip()
+        s = text.strip().lower()
         
         # Academic background (degrees + universities + years)
-        if self.DEGREE.search(s) or (re.search(r"\b(University|College|School|Institute)\b", s, re.I) and self.YEAR.search(s)):
+        if self.DEGREE_LC.search(s):
+            return "studies"
+        uni = self.UNI_WORD_LC.search(s)
+        if uni and self.YEAR_LC.search(s):
             return "studies"
         
         # Teaching experience (courses)
-        if re.search(self.COURSE_HINTS, s, re.I):
+        if self.COURSE_HINTS_LC.search(s):
             return "courses"
         
-        # Corporate experience (structured lines with roles)
-        if re.search(self.ROLE_WORDS + r".*,", s, re.I):
-            return "corporate"
+        # Corporate experience (role word followed by a comma on the same line)
+        for m in self.ROLE_WORDS_LC.finditer(s):
+            if "," in s[m.end():].split("\n", 1)[0]:
+                return "corporate"
         
         # General university mentions
-        if re.search(r"\b(University|College|School|Institute)\b", s, re.I):
+        if uni:
             return "university"
         
         return "other"
@@ -194,8 +272,7 @@ class HybridNERProcessor:
             return False
         
         # Filter out academic fields and other non-locations
-        bad_location = r"\b(Studies|Science|Engineering|Business|Administration|Economics|Law|Design|Arts|Technology|Protocol|Initiative|Panel|Committee)\b"
-        if re.search(bad_location, name, re.I):
+        if self.BAD_LOCATION.search(name):
             return False
         return True
     
@@ -205,8 +282,7 @@ class HybridNERProcessor:
             return False
         
         # Filter out panels, committees, and descriptive text
-        bad_patterns = r"\b(Panel|Initiative|Committee|Board|where|a company|the|Expert|Experts|Digital|Economy)\b"
-        if len(name.split()) > 4 or name.startswith(("where", "a company", "the")) or re.search(bad_patterns, name, re.I):
+        if len(name.split()) > 4 or name.startswith(("where", "a company", "the")) or self.BAD_COMPANY.search(name):
             return False
         return True
 
@@ -265,7 +341,7 @@ class HybridNERProcessor:
     def extract_corporate_experience(self, line, orgs, locs):
         """Extract companies and locations from corporate experience lines"""
         # Only process structured corporate lines (Position, Company, Location, Years)
-        if not re.search(r"^[^,]+,\s*[^,]+(?:,\s*[^,]+)*$", line) or len(line.split(",")) < 2:
+        if not self.COMMA_LINE.search(line) or len(line.split(",")) < 2:
             return []
         
         parts = [p.strip() for p in line.split(",")]
@@ -294,7 +370,7 @@ class HybridNERProcessor:
                     break
             # Fallback to known countries
             if not location:
-                country_match = re.search(r"\b(USA|UK|U\.K\.|UAE|Spain|Belgium|Mexico|Colombia|Germany|France|Italy)\b", tail, re.I)
+                country_match = self.COUNTRY.search(tail)
                 if country_match:
                     location = country_match.group(1)
         
@@ -303,18 +379,18 @@ class HybridNERProcessor:
     def extract_courses(self, line, orgs):
         """Extract courses and teaching institutions"""
         # Find course pattern: "Professor of X" or "teaches Y"
-        m = re.search(r"(?:Professor of|teaches?|taught|lectures?\s+on)\s+(.+?)(?:\s+at\s+[^,.;]+)?(?:[,.;]|$)", line, re.I)
+        m = self.COURSE_PHRASE.search(line)
         if not m:
             return []
         
         # Split multiple courses
         chunk = m.group(1).strip()
-        items = re.split(r"\s*(?:,| and | & )\s*", chunk)
+        items = self.COURSE_SPLIT.split(chunk)
         items = [i.strip() for i in items if i.strip() and len(i.strip()) > 2]
         
         # Find teaching institution
         inst = None
-        m2 = re.search(r"\bat\s+([A-Z][^,.;]*(?:University|School|College|Institute))", line, re.I)
+        m2 = self.TEACHING_INST.search(line)
         if m2:
             inst = m2.group(1).strip()
         elif orgs:
@@ -329,11 +405,85 @@ class HybridNERProcessor:
 # SECTION 6: MAIN EXTRACTION LOGIC
 # ============================================================================
 
+    def run_ner(self, lines):
+        """Run BERT NER on a list of lines in batches, keeping confident spans"""
+        if not lines:
+            return []
+        if self.span_cache is not None:
+            return self.run_ner_cached(lines)
+        outputs = self.ner_pipeline(lines, batch_size=self.batch_size)
+        return [[s for s in spans if s["score"] >= self.MIN_SCORE] for spans in outputs]
+    
+    def run_ner_cached(self, lines):
+        """Run BERT NER only on lines missing from the persistent span cache
+        
+        Keys use the exact line text: spans carry character offsets and the
+        model is cased, so lines that only match after canon() cannot share them.
+        """
+        keys = [SpanCache.make_key(line, self.MODEL_NAME, self.MIN_SCORE) for line in lines]
+        cached = self.span_cache.get_many(keys)
+        
+        # Each unseen line is inferred once, even if repeated in this batch
+        missing = {}
+        for key, line in zip(keys, lines):
+            if key not in cached and key not in missing:
+                missing[key] = line
+        
+        if missing:
+            outputs = self.ner_pipeline(list(missing.values()), batch_size=self.batch_size)
+            new_items = [
+                (key, to_cacheable([s for s in spans if s["score"] >= self.MIN_SCORE]))
+                for key, spans in zip(missing, outputs)
+            ]
+            self.span_cache.put_many(new_items)
+            cached.update(new_items)
+        
+        return [cached[key] for key in keys]
+    
+    def needs_ner(self, line_type):
+        """Whether a line of this type has to go through BERT"""
+        return line_type != "other" and line_type not in self.regex_only_types
+    
+    def regex_spans(self, line):
+        """Build BERT-like spans from comma structure for regex-only lines
+        
+        Comma segments that look like universities become ORG spans and known
+        countries become LOC spans; companies fall back to the segment text.
+        """
+        spans = []
+        for m in self.COMMA_SEGMENT.finditer(line):
+            seg = m.group(0).strip()
+            if seg and self.UNI_HINT.search(seg):
+                start = m.start() + m.group(0).index(seg)
+                spans.append({"entity_group": "ORG", "word": seg, "start": start,
+                              "end": start + len(seg), "score": 1.0})
+        for m in self.COUNTRY.finditer(line):
+            spans.append({"entity_group": "LOC", "word": m.group(1), "start": m.start(),
+                          "end": m.end(), "score": 1.0})
+        return spans
+    
+    def spans_for_lines(self, lines, line_types):
+        """Get spans per line, running BERT only on lines that need it"""
+        ner_idx = [i for i, t in enumerate(line_types) if self.needs_ner(t)]
+        ner_spans = self.run_ner([lines[i] for i in ner_idx])
+        
+        spans = [
+            self.regex_spans(line) if t in self.regex_only_types else []
+            for line, t in zip(lines, line_types)
+        ]
+        for i, s in zip(ner_idx, ner_spans):
+            spans[i] = s
+        return spans
+    
     def extract_entities_from_line(self, line, line_type):
         """Main extraction method - routes to specific extractors based on line type"""
         
-        # Run BERT NER on the line
-        spans = [s for s in self.ner_pipeline(line) if s["score"] >= self.MIN_SCORE]
+        # Lines that cannot yield entities never reach BERT
+        spans = self.spans_for_lines([line], [line_type])[0]
+        return self.route_line(line, line_type, spans)
+    
+    def route_line(self, line, line_type, spans):
+        """Route a line and its BERT spans to the matching extractor"""
         orgs = self.merge_adjacent_orgs(spans, line)
         locs = [s for s in spans if s["entity_group"] in ("LOC", "MISC")]
         
@@ -366,21 +516,8 @@ class HybridNERProcessor:
     def format_structured_output(self, entities):
         """Convert extracted entities to required structure"""
         structured_result = {
-            "academic_experience": {
-                "Course": [],
-                "Program": [],
-                "Organization": []  # Teaching universities
-            },
-            "academic_background": {
-                "Organization": [],  # Study universities
-                "Location": [],
-                "Education": [],
-                "Period": []
-            },
-            "corporate_experience": {
-                "Organization": [],  # Companies
-                "Location": []
-            }
+            section: {category: [] for category in categories}
+            for section, categories in RESULT_SCHEMA.items()
         }
         
         for entity in entities:
@@ -423,50 +560,136 @@ class HybridNERProcessor:
         x = unicodedata.normalize("NFKC", s).lower().strip()
         x = self.NOISE.sub(" ", x)
         x = self.LEGAL_SUFFIX.sub("", x)
-        x = re.sub(r"\s*&\s*", " & ", x)
-        x = re.sub(r"\s{2,}", " ", x).strip().strip(",.")
+        x = self.AMPERSAND.sub(" & ", x)
+        x = self.MULTI_SPACE.sub(" ", x).strip().strip(",.")
         x = self.ALIASES.get(x, x)
         return x
     
     def unique_lines(self, lines):
-        """Remove duplicate lines"""
+        """Remove duplicate lines (within the document, or across documents in lru/bloom scope)"""
+        seen = self.seen_lines if self.seen_lines is not None else set()
         uniq = []
         for ln in lines:
             k = self.canon(ln)
-            if k and k not in self.seen_lines:
+            if k and k not in seen:
                 uniq.append(ln)
-                self.seen_lines.add(k)
+                seen.add(k)
         return uniq
 
 # ============================================================================
 # SECTION 8: MAIN PROCESSING METHOD
 # ============================================================================
 
+    def close(self):
+        """Release the span cache connection"""
+        if self.span_cache is not None:
+            self.span_cache.close()
+    
     def process_professor(self, html_content, prof_id, alias):
         """Main method to process a single professor's biography"""
+        return self.process_professors([(html_content, prof_id, alias)])[0]
+    
+    def process_professors(self, professors):
+        """Process several biographies with one batched BERT pass over all their lines
         
-        # Extract lines from HTML
-        lines = self.extract_lines_from_html(html_content)
-        
-        all_entities = []
-        
-        # Process each line
-        for line in lines:
-            line_type = self.line_type(line)
-            entities = self.extract_entities_from_line(line, line_type)
-            all_entities.extend(entities)
-        
-        # Format to required structure
-        structured_result = self.format_structured_output(all_entities)
+        Args:
+            professors: Iterable of (html_content, prof_id, alias) tuples
+            
+        Returns:
+            List of result dicts in input order
+        """
+        
+        # Extract lines from HTML for every professor first
+        prof_lines = [
+            (prof_id, alias, self.extract_lines_from_html(html_content))
+            for html_content, prof_id, alias in professors
+        ]
+        
+        # Classify every line, then run BERT once over the lines that need it
+        all_lines = [line for _, _, lines in prof_lines for line in lines]
+        all_types = [self.line_type(line) for line in all_lines]
+        all_spans = self.spans_for_lines(all_lines, all_types)
+        
+        results = []
+        pos = 0
+        for prof_id, alias, lines in prof_lines:
+            all_entities = []
+            
+            # Route each line with its spans
+            for line in lines:
+                entities = self.route_line(line, all_types[pos], all_spans[pos])
+                all_entities.extend(entities)
+                pos += 1
+            
+            # Format to required structure
+            structured_result = self.format_structured_output(all_entities)
+            
+            results.append({
+                "id": prof_id,
+                "alias": alias,
+                **structured_result
+            })
         
-        return {
-            "id": prof_id,
-            "alias": alias,
-            **structured_result
-        }
+        return results
+
+# ============================================================================
+# SECTION 9: MULTI-PROCESS EXECUTION
+# ============================================================================
+
+_WORKER_PROCESSOR = None
+
+def _init_worker(processor_kwargs, torch_threads):
+    """Load one HybridNERProcessor per worker process with a capped thread count"""
+    global _WORKER_PROCESSOR
+    import torch
+    torch.set_num_threads(torch_threads)
+    _WORKER_PROCESSOR = HybridNERProcessor(**processor_kwargs)
+
+def _process_shard(professors):
+    """Process a shard of (html_content, prof_id, alias) tuples in a worker"""
+    return _WORKER_PROCESSOR.process_professors(professors)
+
+class ParallelHybridNERProcessor:
+    """Runs HybridNERProcessor in a process pool, one model per worker
+    
+    Exposes process_professors like HybridNERProcessor; shards are processed
+    concurrently and results come back in input order.
+    """
+    
+    def __init__(self, n_workers=2, torch_threads=None, shard_size=16, **processor_kwargs):
+        """
+        Args:
+            n_workers: Number of worker processes
+            torch_threads: Torch intra-op threads per worker (default: cores / workers)
+            shard_size: Professors per task sent to a worker
+            **processor_kwargs: Passed to each worker's HybridNERProcessor
+        """
+        if torch_threads is None:
+            torch_threads = max(1, (os.cpu_count() or 1) // n_workers)
+        self.n_workers = n_workers
+        self.shard_size = shard_size
+        # spawn: workers must not inherit an initialized torch/tokenizer state
+        self.executor = ProcessPoolExecutor(
+            max_workers=n_workers,
+            mp_context=mp.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(processor_kwargs, torch_threads)
+        )
+    
+    def process_professors(self, professors):
+        """Process biographies across the pool, preserving input order"""
+        professors = list(professors)
+        shards = [professors[i:i + self.shard_size] for i in range(0, len(professors), self.shard_size)]
+        return [result for shard in self.executor.map(_process_shard, shards) for result in shard]
+    
+    def process_professor(self, html_content, prof_id, alias):
+        return self.process_professors([(html_content, prof_id, alias)])[0]
+    
+    def close(self):
+        self.executor.shutdown()
 
 # ============================================================================
-# SECTION 9: MAIN EXECUTION
+# SECTION 10: MAIN EXECUTION
 # ============================================================================
 
 if __name__ == "__main__":
@@ -0,0 +1,119 @@
+"""
+STAGE CHECKPOINTS
+=================
+Append-only JSON Lines file of the rows an extraction stage has finished.
+The first line identifies the run (backend version and input); every other
+line is one row result with the content hash of the row it was extracted
+from. A crashed or preempted run can be resumed from the rows already in the
+file; callers compare the hashes so rows edited since are extracted again.
+"""
+
+import os
+import json
+
+# ============================================================================
+# SECTION 1: CHECKPOINT FILE
+# ============================================================================
+
+class StageCheckpoint:
+    def __init__(self, path, header, resume=False):
+        """Open a checkpoint file
+
+        Only the id, content hash and file offset of each finished row are kept
+        in memory; restored rows are read back from the file when asked for.
+
+        Args:
+            path: JSON Lines file
+            header: Dict identifying the run; a resumed file must have the same header
+            resume: Keep the rows of an existing matching file instead of starting over
+        """
+        self.path = path
+        self.header = header
+        self.row_hashes = {}  # row id -> content hash the result was extracted from
+        self.offsets = {}     # row id -> byte offset of its line
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if resume and os.path.exists(path):
+            self._load()
+
+        if not self.row_hashes:
+            with open(path, 'wb') as f:
+                f.write((json.dumps({"header": header}) + '\n').encode('utf-8'))
+        self.file = open(path, 'ab')
+
+    def _load(self):
+        """Index finished rows, dropping a last line cut short by a crash"""
+        good_bytes = 0
+        with open(self.path, 'rb') as f:
+            try:
+                first = f.readline()
+                header = json.loads(first)["header"]
+            except (ValueError, KeyError):
+                header = None
+            if header != self.header:
+                print(f"Checkpoint {self.path} is from a different run, starting over")
+                return
+
+            good_bytes = len(first)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    result = json.loads(line)
+                except ValueError:
+                    break
+                self.row_hashes[result['id']] = result.get('row_hash')
+                self.offsets[result['id']] = good_bytes
+                good_bytes += len(line)
+            truncated = f.seek(0, os.SEEK_END) > good_bytes
+
+        if truncated:
+            with open(self.path, 'r+b') as f:
+                f.truncate(good_bytes)
+        print(f"Resuming from {self.path}: {len(self.row_hashes)} rows already done")
+
+    def is_done(self, row_id, row_hash):
+        """Whether the row was checkpointed from content with this hash"""
+        return row_id in self.row_hashes and self.row_hashes[row_id] == row_hash
+
+    def read(self, row_ids):
+        """Return {row id: result} for checkpointed rows, read back from the file"""
+        results = {}
+        with open(self.path, 'rb') as f:
+            for row_id in row_ids:
+                f.seek(self.offsets[row_id])
+                result = json.loads(f.readline())
+                result.pop('row_hash', None)
+                results[row_id] = result
+        return results
+
+    def append(self, results, row_hashes):
+        """Record finished rows (with {row id: content hash}) and flush them to disk"""
+        offset = self.file.seek(0, os.SEEK_END)
+        for result in results:
+            row_hash = row_hashes[result['id']]
+            line = json.dumps({**result, 'row_hash': row_hash}, ensure_ascii=False, separators=(',', ':'))
+            data = (line + '\n').encode('utf-8')
+            self.file.write(data)
+            self.row_hashes[result['id']] = row_hash
+            self.offsets[result['id']] = offset
+            offset += len(data)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+# ============================================================================
+# SECTION 2: CHECKPOINT LOCATIONS
+# ============================================================================
+
+def checkpoint_path(checkpoint_dir, stage):
+    return os.path.join(checkpoint_dir, f"{stage}.jsonl")
+
+def remove_checkpoints(checkpoint_dir, stages):
+    """Delete the checkpoints of stages whose results are safely saved"""
+    for stage in stages:
+        path = checkpoint_path(checkpoint_dir, stage)
+        if os.path.exists(path):
+            os.remove(path)
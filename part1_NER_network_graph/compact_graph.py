@@ -0,0 +1,322 @@
+"""
+COMPACT GRAPH
+=============
+Integer-indexed directed graph for the professor network, as an alternative to
+nx.DiGraph (a few hundred bytes of dicts per node and edge).
+
+Node names are interned once and nodes are ids 0..n-1 in insertion order;
+node types and edge relations are uint8 codes into NODE_TYPES and RELATIONS.
+Edges are three flat arrays (source, target, relation) plus a CSR index by
+source (and a CSC index by target, built on first use) for degree and
+neighbour queries. Converters to and from NetworkX and GEXF keep the node
+order and the edge set, but not the edge order: networkx writes edges grouped
+by source node, so read_gexf(write_gexf(graph)) has its edges in that order.
+
+Besides GEXF the graph can be exported as Parquet node and edge tables, a
+compressed NPZ of the CSR adjacency, GraphML or a tab-separated edge list;
+the last two are streamed to disk in chunks.
+"""
+
+import os
+import sys
+import csv
+from itertools import islice, pairwise
+from xml.sax.saxutils import quoteattr
+import numpy as np
+import networkx as nx
+
+NODE_TYPES = ("professor", "university", "company", "course", "program", "degree", "location", "year")
+RELATIONS = (
+    "teaches", "teaches_in_program", "teaches_at", "studied_at", "has_degree",
+    "graduated_in", "studied_in", "worked_at", "worked_in"
+)
+NODE_TYPE_CODES = {node_type: code for code, node_type in enumerate(NODE_TYPES)}
+RELATION_CODES = {relation: code for code, relation in enumerate(RELATIONS)}
+
+# node_counts value of nodes without a global count (professors)
+NO_COUNT = -1
+
+# Export formats of export_graph()
+GRAPH_FORMATS = ("gexf", "parquet", "npz", "graphml", "edgelist")
+
+# Nodes or edges per write of the streaming writers
+WRITE_CHUNK = 65536
+
+def _codes(values, codes, kind):
+    try:
+        return np.array([codes[value] for value in values], dtype=np.uint8)
+    except KeyError as e:
+        raise ValueError(f"Unknown {kind} {e.args[0]!r} (expected one of {tuple(codes)})") from None
+
+# ============================================================================
+# SECTION 1: GRAPH
+# ============================================================================
+
+class CompactGraph:
+    def __init__(self, names, node_types, src, dst, relations, node_counts=None):
+        """Build a graph from node and edge arrays
+
+        Args:
+            names: Node names, one per node id
+            node_types: NODE_TYPES code per node
+            src, dst: Source and target node id per edge
+            relations: RELATIONS code per edge
+            node_counts: Global mention count per node (NO_COUNT where there is none)
+        """
+        self.names = list(names)
+        n = len(self.names)
+        self.node_types = np.asarray(node_types, dtype=np.uint8)
+        self.node_counts = (np.full(n, NO_COUNT, dtype=np.int64) if node_counts is None
+                            else np.asarray(node_counts, dtype=np.int64))
+        self.src = np.asarray(src, dtype=np.int32)
+        self.dst = np.asarray(dst, dtype=np.int32)
+        self.relations = np.asarray(relations, dtype=np.uint8)
+
+        # CSR by source: out-neighbours of i are dst[edge_order[indptr[i]:indptr[i + 1]]]
+        self.edge_order = np.argsort(self.src, kind='stable').astype(np.int32)
+        self.indptr = np.concatenate([[0], np.cumsum(np.bincount(self.src, minlength=n))]).astype(np.int64)
+        self._in_order = None
+        self._in_indptr = None
+        self._ids = None
+
+    def number_of_nodes(self):
+        return len(self.names)
+
+    def number_of_edges(self):
+        return len(self.src)
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by the graph (arrays plus interned names)"""
+        arrays = (self.node_types, self.node_counts, self.src, self.dst, self.relations, self.edge_order, self.indptr)
+        return (sum(array.nbytes for array in arrays) + sys.getsizeof(self.names)
+                + sum(sys.getsizeof(name) for name in self.names))
+
+# ============================================================================
+# SECTION 2: QUERIES
+# ============================================================================
+
+    def node_id(self, name):
+        """Id of a node name (KeyError if it is not in the graph)"""
+        if self._ids is None:
+            self._ids = {node: i for i, node in enumerate(self.names)}
+        return self._ids[name]
+
+    def node_type(self, node_id):
+        return NODE_TYPES[self.node_types[node_id]]
+
+    def out_degree(self):
+        """Out-degree of every node, as an array indexed by node id"""
+        return np.diff(self.indptr)
+
+    def in_degree(self):
+        return np.bincount(self.dst, minlength=len(self.names))
+
+    def degree(self):
+        return self.out_degree() + self.in_degree()
+
+    def successors(self, node_id):
+        """Ids of the nodes node_id points to, in edge order"""
+        return self.dst[self.edge_order[self.indptr[node_id]:self.indptr[node_id + 1]]]
+
+    def out_relations(self, node_id):
+        """RELATIONS codes of node_id's out-edges, aligned with successors()"""
+        return self.relations[self.edge_order[self.indptr[node_id]:self.indptr[node_id + 1]]]
+
+    def predecessors(self, node_id):
+        """Ids of the nodes pointing to node_id, in edge order"""
+        if self._in_order is None:
+            # CSC index, built on first use
+            self._in_order = np.argsort(self.dst, kind='stable').astype(np.int32)
+            self._in_indptr = np.concatenate([[0], np.cumsum(self.in_degree())]).astype(np.int64)
+        return self.src[self._in_order[self._in_indptr[node_id]:self._in_indptr[node_id + 1]]]
+
+# ============================================================================
+# SECTION 3: NETWORKX AND GEXF CONVERSION
+# ============================================================================
+
+    def to_networkx(self):
+        """nx.DiGraph with 'type' (and 'count') node attributes and 'relation' edge attributes"""
+        G = nx.DiGraph()
+        counts = self.node_counts.tolist()
+        G.add_nodes_from(
+            (name, {"type": NODE_TYPES[code]} if count == NO_COUNT else {"type": NODE_TYPES[code], "count": count})
+            for name, code, count in zip(self.names, self.node_types.tolist(), counts)
+        )
+        names = self.names
+        G.add_edges_from(
+            (names[s], names[d], {"relation": RELATIONS[r]})
+            for s, d, r in zip(self.src.tolist(), self.dst.tolist(), self.relations.tolist())
+        )
+        return G
+
+    @classmethod
+    def from_networkx(cls, G):
+        """Build from a DiGraph shaped like build_knowledge_graph's output"""
+        names = list(G)
+        ids = {name: i for i, name in enumerate(names)}
+        node_types = _codes((data.get("type") for _, data in G.nodes(data=True)), NODE_TYPE_CODES, "node type")
+        node_counts = [data.get("count", NO_COUNT) for _, data in G.nodes(data=True)]
+        edges = list(G.edges(data="relation"))
+        graph = cls(
+            names, node_types,
+            np.array([ids[u] for u, _, _ in edges], dtype=np.int32),
+            np.array([ids[v] for _, v, _ in edges], dtype=np.int32),
+            _codes((relation for _, _, relation in edges), RELATION_CODES, "relation"),
+            node_counts
+        )
+        graph._ids = ids
+        return graph
+
+    def write_gexf(self, path):
+        nx.write_gexf(self.to_networkx(), path)
+
+    @classmethod
+    def read_gexf(cls, path):
+        """Load a GEXF file written by build_knowledge_graph or write_gexf"""
+        G = nx.read_gexf(path)
+        for _, data in G.nodes(data=True):
+            data.pop("label", None)
+        return cls.from_networkx(G)
+
+# ============================================================================
+# SECTION 4: BINARY AND STREAMING EXPORT
+# ============================================================================
+
+    def _edge_rows(self):
+        """(source name, target name, relation) per edge, in edge order"""
+        names = self.names
+        return ((names[s], names[d], RELATIONS[r])
+                for s, d, r in zip(self.src.tolist(), self.dst.tolist(), self.relations.tolist()))
+
+    def write_parquet(self, nodes_path, edges_path):
+        """Write node (id, name, type, count) and edge (source, target, relation) tables
+
+        Types and relations are dictionary-encoded; count is null for professors.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        counts = pa.array(self.node_counts, mask=self.node_counts == NO_COUNT)
+        nodes = pa.table({
+            "id": pa.array(np.arange(len(self.names), dtype=np.int32)),
+            "name": pa.array(self.names, type=pa.string()),
+            "type": pa.DictionaryArray.from_arrays(pa.array(self.node_types), pa.array(NODE_TYPES)),
+            "count": counts
+        })
+        edges = pa.table({
+            "source": pa.array(self.src),
+            "target": pa.array(self.dst),
+            "relation": pa.DictionaryArray.from_arrays(pa.array(self.relations), pa.array(RELATIONS))
+        })
+        pq.write_table(nodes, nodes_path)
+        pq.write_table(edges, edges_path)
+
+    @classmethod
+    def read_parquet(cls, nodes_path, edges_path):
+        import pyarrow.parquet as pq
+        nodes = pq.read_table(nodes_path)
+        edges = pq.read_table(edges_path)
+        node_types = nodes.column("type").combine_chunks()
+        relations = edges.column("relation").combine_chunks()
+        return cls(
+            nodes.column("name").to_pylist(),
+            _codes(node_types.dictionary.to_pylist(), NODE_TYPE_CODES, "node type")[node_types.indices.to_numpy()],
+            edges.column("source").to_numpy(),
+            edges.column("target").to_numpy(),
+            _codes(relations.dictionary.to_pylist(), RELATION_CODES, "relation")[relations.indices.to_numpy()],
+            nodes.column("count").fill_null(NO_COUNT).to_numpy()
+        )
+
+    def write_npz(self, path):
+        """Save the CSR adjacency (indptr, indices, relations by source) as a compressed NPZ
+
+        edge_order maps CSR positions back to edge order, and the NODE_TYPES
+        and RELATIONS vocabularies are stored alongside their codes. Names are
+        concatenated UTF-8 bytes with name_offsets[i]:name_offsets[i + 1]
+        spanning name i (a fixed-width string array would pad every name to
+        the longest one).
+        """
+        encoded = [name.encode("utf-8") for name in self.names]
+        np.savez_compressed(
+            path,
+            name_bytes=np.frombuffer(b"".join(encoded), dtype=np.uint8),
+            name_offsets=np.concatenate([[0], np.cumsum([len(name) for name in encoded])]).astype(np.int64),
+            node_types=self.node_types,
+            node_counts=self.node_counts,
+            indptr=self.indptr,
+            indices=self.dst[self.edge_order],
+            relations=self.relations[self.edge_order],
+            edge_order=self.edge_order,
+            node_type_names=np.array(NODE_TYPES),
+            relation_names=np.array(RELATIONS)
+        )
+
+    @classmethod
+    def read_npz(cls, path):
+        with np.load(path, allow_pickle=False) as saved:
+            if tuple(saved["node_type_names"]) != NODE_TYPES or tuple(saved["relation_names"]) != RELATIONS:
+                raise ValueError(f"{path} uses other node type or relation codes")
+            indptr, edge_order = saved["indptr"], saved["edge_order"]
+            src, dst, relations = (np.empty(len(edge_order), dtype=dtype) for dtype in (np.int32, np.int32, np.uint8))
+            src[edge_order] = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+            dst[edge_order] = saved["indices"]
+            relations[edge_order] = saved["relations"]
+            name_bytes = saved["name_bytes"].tobytes()
+            names = [name_bytes[start:end].decode("utf-8") for start, end in pairwise(saved["name_offsets"].tolist())]
+            return cls(names, saved["node_types"], src, dst, relations, saved["node_counts"])
+
+    def write_graphml(self, path):
+        """Stream the graph as GraphML (readable by nx.read_graphml), WRITE_CHUNK elements at a time"""
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(
+                "<?xml version='1.0' encoding='utf-8'?>\n"
+                '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n'
+                '  <key id="type" for="node" attr.name="type" attr.type="string"/>\n'
+                '  <key id="count" for="node" attr.name="count" attr.type="long"/>\n'
+                '  <key id="relation" for="edge" attr.name="relation" attr.type="string"/>\n'
+                '  <graph edgedefault="directed">\n'
+            )
+            nodes = (
+                f'    <node id={quoteattr(name)}><data key="type">{NODE_TYPES[code]}</data>'
+                + ('' if count == NO_COUNT else f'<data key="count">{count}</data>') + '</node>\n'
+                for name, code, count in zip(self.names, self.node_types.tolist(), self.node_counts.tolist())
+            )
+            edges = (
+                f'    <edge source={quoteattr(source)} target={quoteattr(target)}>'
+                f'<data key="relation">{relation}</data></edge>\n'
+                for source, target, relation in self._edge_rows()
+            )
+            for lines in (nodes, edges):
+                while chunk := ''.join(islice(lines, WRITE_CHUNK)):
+                    f.write(chunk)
+            f.write('  </graph>\n</graphml>\n')
+
+    def write_edgelist(self, path):
+        """Stream edges as tab-separated source, target, relation names (nodes without edges are lost)"""
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f, dialect='excel-tab')
+            writer.writerow(("source", "target", "relation"))
+            rows = self._edge_rows()
+            while chunk := list(islice(rows, WRITE_CHUNK)):
+                writer.writerows(chunk)
+
+def export_paths(stem, fmt):
+    """Files written for a graph format, e.g. 'results/professor_network' + 'parquet'"""
+    if fmt == "parquet":
+        return [f"{stem}_nodes.parquet", f"{stem}_edges.parquet"]
+    if fmt == "edgelist":
+        return [f"{stem}_edges.tsv"]
+    return [f"{stem}.{fmt}"]
+
+def export_graph(graph, stem, formats):
+    """Write a CompactGraph in each of formats (see GRAPH_FORMATS); returns the paths written"""
+    unknown = set(formats) - set(GRAPH_FORMATS)
+    if unknown:
+        raise ValueError(f"Unknown graph formats {sorted(unknown)} (expected some of {GRAPH_FORMATS})")
+    os.makedirs(os.path.dirname(stem) or ".", exist_ok=True)
+    written = []
+    for fmt in formats:
+        paths = export_paths(stem, fmt)
+        getattr(graph, f"write_{fmt}")(*paths)
+        written.extend(paths)
+    return written
@@ -7,6 +7,8 @@ Normalizes headings and extracts content by section type.
 
 import pandas as pd
 import re
+import os
+from concurrent.futures import ProcessPoolExecutor
 from bs4 import BeautifulSoup
 
 # ============================================================================
@@ -23,99 +25,174 @@ def normalize_heading(heading):
     return heading.lower()
 
 # ============================================================================
-# SECTION 2: HTML CONTENT EXTRACTION
+# SECTION 2: SECTION HEADING DEFINITIONS
 # ============================================================================
 
-def extract_section_content(html_text, section_headings):
-    """Extract content following specific section headings"""
-    if pd.isna(html_text):
-        return ""
+# Define normalized heading categories
+academic_experience_headings = [
+    "academicexperience", "acamicexperience", "teachingandresearchexperience",
+    "coursesacademicexperience", "executiveeducation", "subject", 
+    "acdemicexperience", "academicandresearchexperience",
+    "visitingscholaratthefollowinguniversities", "assistantprofessoreconomics",
+    "teachingandresearchexperience", "academicandprofessionalexperience",
+    "assistantprofessoroperationstechnology", "position",
+    "assistantprofessoreconomía", "professionalteachingexperience",
+    "experience", "course", "professionalexamination"
+]
+
+academic_background_headings = [
+    "academicbackground", "education", "acamicbackground",
+    "researchareas", "academicandresearchexperience", "awards", 
+    "awardsandrecognitions", "selectedpublications", "honorsawards",
+    "awardsgrants", "achievements", "educationprofessionalqualifications",
+    "academicbackgound", "latestpublications", "publications", 
+    "mainpublications", "formaciónacadémica", "academicbackground"
+]
+
+corporate_experience_headings = [
+    "corporateexperience", "professionalexperience", "corporativeexperience",
+    "professionalbackground", "corporateandotherprofessionalexperience",
+    "mainprojects", "academicandprofessionalexperience", 
+    "professionalteachingexperience", "experience", "industryawards"
+]
+
+SECTION_HEADINGS = {
+    "academic_experience": academic_experience_headings,
+    "academic_background": academic_background_headings,
+    "corporate_experience": corporate_experience_headings,
+}
+
+def build_heading_index(section_headings):
+    """Map each normalized heading to the list of sections it belongs to"""
+    index = {}
+    for section, headings in section_headings.items():
+        for h in headings:
+            sections = index.setdefault(normalize_heading(h), [])
+            if section not in sections:
+                sections.append(section)
+    return index
+
+# Normalized once at import instead of on every call
+HEADING_INDEX = build_heading_index(SECTION_HEADINGS)
+
+# ============================================================================
+# SECTION 3: HTML CONTENT EXTRACTION
+# ============================================================================
+
+def _h4_section_text(h4):
+    """Collect the text following an h4 until the next h4 or end"""
+    current = h4.next_sibling
+    section_content = []
     
-    # Normalize target headings
-    normalized_targets = [normalize_heading(h) for h in section_headings]
+    while current:
+        if current.name == 'h4':
+            break
+        if hasattr(current, 'get_text'):
+            section_content.append(current.get_text())
+        elif isinstance(current, str):
+            section_content.append(current)
+        current = current.next_sibling
     
-    # Find all h4 sections
-    soup = BeautifulSoup(html_text, 'html.parser')
-    h4_tags = soup.find_all('h4')
+    return ' '.join(section_content)
+
+def extract_sections(html_text, heading_index=HEADING_INDEX):
+    """Extract content for every section in a single parse of the HTML
     
-    content = []
-    for i, h4 in enumerate(h4_tags):
-        heading_text = h4.get_text()
-        normalized_heading = normalize_heading(heading_text)
-        
-        # Check if this heading matches our targets
-        if normalized_heading in normalized_targets:
-            # Get content until next h4 or end
-            current = h4.next_sibling
-            section_content = []
-            
-            while current:
-                if current.name == 'h4':
-                    break
-                if hasattr(current, 'get_text'):
-                    section_content.append(current.get_text())
-                elif isinstance(current, str):
-                    section_content.append(current)
-                current = current.next_sibling
-            
-            content.append(' '.join(section_content))
+    Each <h4> block is read once and its text is sent to every section
+    whose headings include it (e.g. "experience" feeds both academic and
+    corporate experience).
+    """
+    sections = {}
+    for section_list in heading_index.values():
+        for section in section_list:
+            sections.setdefault(section, [])
+    
+    if pd.isna(html_text):
+        return {section: "" for section in sections}
+    
+    soup = BeautifulSoup(html_text, 'html.parser')
+    for h4 in soup.find_all('h4'):
+        targets = heading_index.get(normalize_heading(h4.get_text()))
+        if targets:
+            text = _h4_section_text(h4)
+            for section in targets:
+                sections[section].append(text)
     
-    return ' '.join(content).strip()
+    return {section: ' '.join(content).strip() for section, content in sections.items()}
 
-# ============================================================================
-# SECTION 3: SECTION HEADING DEFINITIONS
-# ============================================================================
+def extract_section_content(html_text, section_headings):
+    """Extract content following specific section headings"""
+    heading_index = build_heading_index({"content": section_headings})
+    return extract_sections(html_text, heading_index)["content"]
 
-def preprocess_dataset(csv_path):
-    """Preprocess the dataset by extracting sections from HTML content"""
-    
-    # Define normalized heading categories
-    academic_experience_headings = [
-        "academicexperience", "acamicexperience", "teachingandresearchexperience",
-        "coursesacademicexperience", "executiveeducation", "subject", 
-        "acdemicexperience", "academicandresearchexperience",
-        "visitingscholaratthefollowinguniversities", "assistantprofessoreconomics",
-        "teachingandresearchexperience", "academicandprofessionalexperience",
-        "assistantprofessoroperationstechnology", "position",
-        "assistantprofessoreconomía", "professionalteachingexperience",
-        "experience", "course", "professionalexamination"
-    ]
-
-    academic_background_headings = [
-        "academicbackground", "education", "acamicbackground",
-        "researchareas", "academicandresearchexperience", "awards", 
-        "awardsandrecognitions", "selectedpublications", "honorsawards",
-        "awardsgrants", "achievements", "educationprofessionalqualifications",
-        "academicbackgound", "latestpublications", "publications", 
-        "mainpublications", "formaciónacadémica", "academicbackground"
-    ]
-
-    corporate_experience_headings = [
-        "corporateexperience", "professionalexperience", "corporativeexperience",
-        "professionalbackground", "corporateandotherprofessionalexperience",
-        "mainprojects", "academicandprofessionalexperience", 
-        "professionalteachingexperience", "experience", "industryawards"
-    ]
+def _extract_sections_chunk(html_texts):
+    """Extract sections for a chunk of documents (process pool worker)"""
+    return [extract_sections(x) for x in html_texts]
 
 # ============================================================================
 # SECTION 4: MAIN PREPROCESSING PIPELINE
 # ============================================================================
+
+def add_section_columns(df, n_workers=1, chunk_size=256):
+    """Return a copy of df with the extracted section columns added
     
-    # Load and process dataset
-    df = pd.read_csv(csv_path)
+    Args:
+        df: DataFrame with a 'full_info' HTML column
+        n_workers: Number of processes to use (1 = in-process, None = all cores)
+        chunk_size: Rows sent to a worker per task
+    """
     df_processed = df.copy()
+    html_texts = df_processed['full_info'].tolist()
     
-    # Extract sections
-    df_processed['academic_experience'] = df_processed['full_info'].apply(
-        lambda x: extract_section_content(x, academic_experience_headings)
-    )
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
     
-    df_processed['academic_background'] = df_processed['full_info'].apply(
-        lambda x: extract_section_content(x, academic_background_headings)
-    )
+    if n_workers > 1 and len(html_texts) > chunk_size:
+        chunks = [html_texts[i:i + chunk_size] for i in range(0, len(html_texts), chunk_size)]
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            # map() yields chunks in submission order, so row order is preserved
+            extracted = [row for chunk in executor.map(_extract_sections_chunk, chunks) for row in chunk]
+    else:
+        extracted = _extract_sections_chunk(html_texts)
     
-    df_processed['corporate_experience'] = df_processed['full_info'].apply(
-        lambda x: extract_section_content(x, corporate_experience_headings)
-    )
+    for section in SECTION_HEADINGS:
+        df_processed[section] = [row[section] for row in extracted]
+    
+    return df_processed
+
+def iter_raw_batches(path, batch_size=256):
+    """Yield the raw dataset in DataFrame batches without loading it whole
+    
+    CSV files are read with pandas' chunked reader; Parquet files are read
+    row group by row group (split further into batch_size slices) through
+    pyarrow. Batches keep a global row index, matching a full read.
+    """
+    if str(path).lower().endswith('.parquet'):
+        import pyarrow.parquet as pq
+        
+        parquet_file = pq.ParquetFile(path)
+        offset = 0
+        for record_batch in parquet_file.iter_batches(batch_size=batch_size):
+            batch = record_batch.to_pandas()
+            batch.index = pd.RangeIndex(offset, offset + len(batch))
+            offset += len(batch)
+            yield batch
+    else:
+        # read_csv chunks continue the RangeIndex across batches
+        for batch in pd.read_csv(path, chunksize=batch_size):
+            yield batch
+
+def iter_preprocessed_batches(path, batch_size=256, n_workers=1, chunk_size=256):
+    """Stream the dataset and yield preprocessed batches one at a time"""
+    for batch in iter_raw_batches(path, batch_size):
+        yield add_section_columns(batch, n_workers=n_workers, chunk_size=chunk_size)
 
-    return df_processed
\ No newline at end of file
+def preprocess_dataset(csv_path, n_workers=1, chunk_size=256):
+    """Preprocess the dataset by extracting sections from HTML content
+    
+    Set n_workers > 1 (or None for all cores) to parse rows in a process pool.
+    """
+    
+    # Load and process dataset
+    df = pd.read_csv(csv_path)
+    return add_section_columns(df, n_workers=n_workers, chunk_size=chunk_size)
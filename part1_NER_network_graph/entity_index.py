@@ -0,0 +1,195 @@
+"""
+CORPUS-WIDE CANONICAL ENTITY INDEX
+==================================
+Maps every surface form of an entity to a canonical integer id, per entity
+type, across all professors, so "IE", "IE Business School" and
+"Ie Business School" become one entity.
+
+A new form joins an existing entity when, after applying
+HybridNERProcessor.ALIASES and the merger's normalization, it matches it
+exactly or by word Jaccard similarity, or when it appears (on word boundaries)
+inside exactly one existing entity that is mentioned at least as often. Unlike
+per-professor deduplication, an existing form contained in the new one does
+not count: corpus-wide, a generic form such as "Business School" would
+otherwise absorb every business school.
+
+Ids are assigned in lookup order (the first form seen names the entity) and
+the index can be saved and reloaded, so ids stay stable across runs. Mention
+counts are not saved: they are recounted from the results of each run, so
+canonicalization does not depend on how often the pipeline has run.
+"""
+
+import os
+import json
+from collections import Counter
+from extractors import ENTITY_TYPES
+from entity_merger import SimilarityIndex, normalize_entity
+
+# ============================================================================
+# SECTION 1: NORMALIZATION HELPERS
+# ============================================================================
+
+def default_aliases():
+    from bert_extractor import HybridNERProcessor
+    return dict(HybridNERProcessor.ALIASES)
+
+def contains_words(text, part):
+    """Whether part occurs in text on word boundaries (like \\b, without a regex per lookup)"""
+    start = text.find(part)
+    while start != -1:
+        end = start + len(part)
+        if (start == 0 or not is_word_char(text[start - 1])) and (end == len(text) or not is_word_char(text[end])):
+            return True
+        start = text.find(part, start + 1)
+    return False
+
+def is_word_char(char):
+    return char.isalnum() or char == '_'
+
+# ============================================================================
+# SECTION 2: INDEX
+# ============================================================================
+
+class CanonicalEntityIndex:
+    def __init__(self, threshold=0.8, aliases=None):
+        """
+        Args:
+            threshold: Word Jaccard similarity at which two forms are the same entity
+            aliases: Normalized form -> canonical form (default: HybridNERProcessor.ALIASES)
+        """
+        self.threshold = threshold
+        self.aliases = default_aliases() if aliases is None else dict(aliases)
+        self.names = []       # id -> display name (first surface form seen)
+        self.types = []       # id -> entity type
+        self.norms = []       # id -> canonical normalized form
+        self.counts = []      # id -> mentions in the results registered this run
+        self.forms = {}       # (entity type, normalized form) -> id
+        self._similar = {}    # entity type -> SimilarityIndex over canonical forms
+
+    def __len__(self):
+        return len(self.names)
+
+    def normalize(self, surface):
+        norm = ' '.join(normalize_entity(surface).split())
+        return self.aliases.get(norm, norm)
+
+    def lookup(self, entity_type, surface, count=0):
+        """Return the id of a surface form, adding a new entity if nothing similar exists
+
+        count is the number of mentions to register for the form. Empty forms
+        return None (an empty string is contained in every entity).
+        """
+        norm = self.normalize(surface)
+        if not norm:
+            return None
+
+        entity_id = self.forms.get((entity_type, norm))
+        if entity_id is None:
+            entity_id = self._match(entity_type, norm, count)
+            if entity_id is None:
+                entity_id = self._add(entity_type, norm, surface.strip())
+            self.forms[(entity_type, norm)] = entity_id
+        self.counts[entity_id] += count
+        return entity_id
+
+    def _match(self, entity_type, norm, count=0):
+        """Id of the existing entity a new normalized form belongs to, or None"""
+        similar = self._similar.get(entity_type)
+        if similar is None:
+            return None
+
+        jaccard_matches = {self.forms[(entity_type, other)] for other in similar.jaccard_matches(norm)}
+        if jaccard_matches:
+            # Deterministic: the oldest similar entity wins
+            return min(jaccard_matches)
+
+        containing = set()
+        for other in similar.containing(norm):
+            if contains_words(other, norm):
+                containing.add(self.forms[(entity_type, other)])
+                if len(containing) > 1:
+                    return None
+        if containing:
+            other_id = containing.pop()
+            if self.counts[other_id] >= count:
+                return other_id
+        return None
+
+    def _add(self, entity_type, norm, name, count=0):
+        entity_id = len(self.names)
+        self.names.append(name)
+        self.types.append(entity_type)
+        self.norms.append(norm)
+        self.counts.append(count)
+        self.forms[(entity_type, norm)] = entity_id
+        self._similar.setdefault(entity_type, SimilarityIndex(self.threshold)).add(norm)
+        return entity_id
+
+    def unique_ids(self, entity_type, surfaces):
+        """Ids of surface forms in first-seen order, without repeats or empty forms"""
+        ids = (self.lookup(entity_type, surface) for surface in surfaces)
+        return list(dict.fromkeys(i for i in ids if i is not None))
+
+    def name(self, entity_id):
+        return self.names[entity_id]
+
+    def add_results(self, *results_lists):
+        """Register every entity of one or more results lists
+
+        Mention counts are reset first, so they are those of these results only.
+        
+        Distinct forms are looked up longest (in words) first, so a short form is
+        only folded into a longer entity once every entity that could contain it
+        is known; then most frequent first, so the common spelling names each
+        entity. Ids therefore do not depend on the order rows were extracted in.
+        """
+        counts = Counter(
+            (entity_type, surface.strip())
+            for results in results_lists
+            for result in results
+            for (section, category), entity_type in ENTITY_TYPES.items()
+            for surface in result.get(section, {}).get(category, ())
+        )
+        # Counter keeps first-appearance order, and sorted() is stable
+        order = sorted(counts.items(), key=lambda item: (-len(item[0][1].split()), -item[1]))
+        self.counts = [0] * len(self.names)
+        for (entity_type, surface), count in order:
+            self.lookup(entity_type, surface, count)
+
+# ============================================================================
+# SECTION 3: PERSISTENCE
+# ============================================================================
+
+    def save(self, path):
+        """Write the index (without mention counts) as JSON, atomically"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "threshold": self.threshold,
+                "aliases": self.aliases,
+                "entities": [list(entity) for entity in zip(self.types, self.norms, self.names)],
+                "forms": [[entity_type, norm, entity_id] for (entity_type, norm), entity_id in self.forms.items()]
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, threshold=0.8, aliases=None):
+        """Load a saved index, or start an empty one if it is missing or used other settings"""
+        index = cls(threshold, aliases)
+        if not os.path.exists(path):
+            return index
+
+        with open(path, 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+        if saved["threshold"] != index.threshold or saved["aliases"] != index.aliases:
+            print(f"Entity index {path} was built with other settings, starting a new one")
+            return index
+
+        # Files written before counts were dropped have a fourth, stale count field
+        for entity_type, norm, name, *_ in saved["entities"]:
+            index._add(entity_type, norm, name)
+        for entity_type, norm, entity_id in saved["forms"]:
+            index.forms[(entity_type, norm)] = entity_id
+        print(f"Loaded entity index {path}: {len(index)} entities, {len(index.forms)} surface forms")
+        return index
@@ -1,5 +1,10 @@
 import json
-from typing import List, Dict, Any, Set
+import multiprocessing as mp
+from itertools import islice, pairwise
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import List, Dict, Any, Set, Iterable, Iterator
+from extractors import ENTITY_TYPES, RESULT_SCHEMA, empty_result
 
 # ============================================================================
 # SECTION 1: UTILITY FUNCTIONS
@@ -19,7 +24,10 @@ def entities_are_similar(entity1: str, entity2: str, threshold: float = 0.8) ->
     - Natural threshold interpretation: 0.8 = 80% shared words
     """
     norm1, norm2 = normalize_entity(entity1), normalize_entity(entity2)
-    
+    return normalized_are_similar(norm1, set(norm1.split()), norm2, set(norm2.split()), threshold)
+
+def normalized_are_similar(norm1: str, words1: Set[str], norm2: str, words2: Set[str], threshold: float = 0.8) -> bool:
+    """entities_are_similar for already normalized entities and their word sets"""
     # Exact match
     if norm1 == norm2:
         return True
@@ -29,7 +37,6 @@ def entities_are_similar(entity1: str, entity2: str, threshold: float = 0.8) ->
         return True
     
     # Jaccard similarity: |intersection| / |union| of word sets
-    words1, words2 = set(norm1.split()), set(norm2.split())
     if len(words1) > 0 and len(words2) > 0:
         intersection = len(words1.intersection(words2))
         union = len(words1.union(words2))
@@ -42,36 +49,159 @@ def entities_are_similar(entity1: str, entity2: str, threshold: float = 0.8) ->
 # SECTION 2: ENTITY DEDUPLICATION
 # ============================================================================
 
-def deduplicate_entities(entities: List[str]) -> List[str]:
-    """Remove duplicate entities from a list"""
+# Lists up to this size are deduplicated pairwise (index setup costs more below it)
+PAIRWISE_MAX_ENTITIES = 128
+
+class SimilarityIndex:
+    """Finds whether a normalized entity is similar to any entity added so far
+    
+    Gives the same answer as checking entities_are_similar against every added
+    entity, without the pairwise scan:
+    - exact matches: hash set
+    - containment: character n-grams (n <= 3). A string of up to 3 characters
+      is contained in another iff it is one of its n-grams; longer strings are
+      looked up by their first trigram (contained in the new entity) or by
+      their rarest trigram (containing the new entity)
+    - Jaccard >= threshold: inverted index over a prefix of each sorted word
+      set; two sets that reach the threshold always share a prefix word
+    """
+    
+    NGRAM = 3
+    
+    def __init__(self, threshold: float = 0.8):
+        self.threshold = threshold
+        self.exact: Set[str] = set()
+        self.short: Set[str] = set()                  # added entities of <= NGRAM chars
+        self.by_first_ngram: Dict[str, List[str]] = {}  # longer entities by their first trigram
+        self.ngram_postings: Dict[str, List[str]] = {}  # n-gram -> added entities containing it
+        self.word_postings: Dict[str, List[tuple]] = {}  # prefix word -> (entity, word set)
+    
+    def _ngrams(self, text: str) -> Set[str]:
+        return {text[i:i + n] for n in range(1, self.NGRAM + 1) for i in range(len(text) - n + 1)}
+    
+    def _prefix(self, words: Set[str]) -> List[str]:
+        # |A & B| >= threshold * |A| whenever Jaccard(A, B) >= threshold
+        required = int(self.threshold * len(words))
+        return sorted(words)[:len(words) - required + 1]
+    
+    def add(self, norm: str) -> None:
+        self.exact.add(norm)
+        if len(norm) <= self.NGRAM:
+            self.short.add(norm)
+        else:
+            self.by_first_ngram.setdefault(norm[:self.NGRAM], []).append(norm)
+        for gram in self._ngrams(norm):
+            self.ngram_postings.setdefault(gram, []).append(norm)
+        
+        words = set(norm.split())
+        for word in self._prefix(words) if words else ():
+            self.word_postings.setdefault(word, []).append((norm, words))
+    
+    def matches(self, norm: str):
+        """Yield added entities similar to norm (possibly repeated), cheapest checks first"""
+        if not self.exact:
+            return
+        
+        # Exact match
+        if norm in self.exact:
+            yield norm
+        yield from self.contained_in(norm)
+        yield from self.containing(norm)
+        yield from self.jaccard_matches(norm)
+    
+    def contained_in(self, norm: str):
+        """Yield added entities contained in norm ('' is contained in everything)"""
+        ngrams = [norm[i:i + n] for n in range(1, self.NGRAM + 1) for i in range(len(norm) - n + 1)]
+        if '' in self.short:
+            yield ''
+        yield from (gram for gram in ngrams if gram in self.short)
+        for gram in ngrams:
+            if len(gram) == self.NGRAM:
+                yield from (other for other in self.by_first_ngram.get(gram, ()) if other in norm)
+    
+    def containing(self, norm: str):
+        """Yield added entities that contain norm"""
+        if not norm:
+            yield from self.exact
+        elif len(norm) <= self.NGRAM:
+            yield from self.ngram_postings.get(norm, ())
+        else:
+            rarest = min(
+                (self.ngram_postings.get(norm[i:i + self.NGRAM], ()) for i in range(len(norm) - self.NGRAM + 1)),
+                key=len
+            )
+            yield from (other for other in rarest if norm in other)
+    
+    def jaccard_matches(self, norm: str):
+        """Yield added entities whose word sets have Jaccard similarity >= threshold with norm's"""
+        words = set(norm.split())
+        if words:
+            for word in self._prefix(words):
+                for other, other_words in self.word_postings.get(word, ()):
+                    if len(words & other_words) / len(words | other_words) >= self.threshold:
+                        yield other
+    
+    def has_similar(self, norm: str) -> bool:
+        return any(True for _ in self.matches(norm))
+
+def deduplicate_entities(entities: List[str], threshold: float = 0.8) -> List[str]:
+    """Remove duplicate entities from a list
+    
+    Keeps the first of each group of similar entities (see entities_are_similar),
+    normalizing every entity once. Long lists look up candidates in a
+    SimilarityIndex; short ones (most per-professor lists) are cheaper to
+    compare pairwise.
+    """
     if not entities:
         return []
     
+    # Every pair of non-empty word sets matches at threshold <= 0; no index can prune that
+    if len(entities) <= PAIRWISE_MAX_ENTITIES or threshold <= 0:
+        return _deduplicate_pairwise(entities, threshold)
+    
     unique_entities = []
+    index = SimilarityIndex(threshold)
     for entity in entities:
-        is_duplicate = False
-        for existing in unique_entities:
-            if entities_are_similar(entity, existing):
-                is_duplicate = True
-                break
-        if not is_duplicate:
+        norm = normalize_entity(entity)
+        if not index.has_similar(norm):
+            index.add(norm)
             unique_entities.append(entity)
     
     return unique_entities
 
+def _deduplicate_pairwise(entities: List[str], threshold: float) -> List[str]:
+    unique_entities = []
+    kept = []
+    for entity in entities:
+        norm = normalize_entity(entity)
+        words = set(norm.split())
+        if not any(normalized_are_similar(norm, words, other, other_words, threshold) for other, other_words in kept):
+            kept.append((norm, words))
+            unique_entities.append(entity)
+    return unique_entities
+
 # ============================================================================
 # SECTION 3: CATEGORY MERGING
 # ============================================================================
 
-def merge_category_entities(gliner_entities: List[str], bert_entities: List[str]) -> List[str]:
-    """Merge entities from two lists, removing duplicates"""
+def merge_category_entities(gliner_entities: List[str], bert_entities: List[str],
+                            entity_index=None, entity_type: str = None) -> List[str]:
+    """Merge entities from two lists, removing duplicates
+    
+    With a CanonicalEntityIndex and the category's entity type, duplicates are
+    dropped by canonical id and each entity is named by its canonical form.
+    """
     # Combine all entities
     all_entities = gliner_entities + bert_entities
     
+    if entity_index is not None and entity_type:
+        return [entity_index.name(i) for i in entity_index.unique_ids(entity_type, all_entities)]
+    
     # Remove duplicates
     return deduplicate_entities(all_entities)
 
-def merge_experience_section(gliner_section: Dict[str, List[str]], bert_section: Dict[str, List[str]]) -> Dict[str, List[str]]:
+def merge_experience_section(gliner_section: Dict[str, List[str]], bert_section: Dict[str, List[str]],
+                             section: str = None, entity_index=None) -> Dict[str, List[str]]:
     """Merge experience sections (academic_experience, academic_background, corporate_experience)"""
     merged_section = {}
     
@@ -81,7 +211,9 @@ def merge_experience_section(gliner_section: Dict[str, List[str]], bert_section:
     for key in all_keys:
         gliner_entities = gliner_section.get(key, [])
         bert_entities = bert_section.get(key, [])
-        merged_section[key] = merge_category_entities(gliner_entities, bert_entities)
+        merged_section[key] = merge_category_entities(
+            gliner_entities, bert_entities, entity_index, ENTITY_TYPES.get((section, key))
+        )
     
     return merged_section
 
@@ -89,8 +221,9 @@ def merge_experience_section(gliner_section: Dict[str, List[str]], bert_section:
 # SECTION 4: MAIN MERGING LOGIC
 # ============================================================================
 
-def merge_single_result(gliner_result: Dict[str, Any], bert_result: Dict[str, Any]) -> Dict[str, Any]:
-    """Merge results for a single person"""
+def merge_single_result(gliner_result: Dict[str, Any], bert_result: Dict[str, Any],
+                        entity_index=None) -> Dict[str, Any]:
+    """Merge results for a single person (canonicalizing entities if an entity_index is given)"""
     # Verify IDs match
     if gliner_result['id'] != bert_result['id']:
         raise ValueError(f"ID mismatch: GLiNER {gliner_result['id']} vs BERT {bert_result['id']}")
@@ -100,21 +233,25 @@ def merge_single_result(gliner_result: Dict[str, Any], bert_result: Dict[str, An
         'alias': gliner_result['alias'],  # Use GLiNER alias as primary
         'academic_experience': merge_experience_section(
             gliner_result['academic_experience'],
-            bert_result['academic_experience']
+            bert_result['academic_experience'],
+            'academic_experience', entity_index
         ),
         'academic_background': merge_experience_section(
             gliner_result['academic_background'],
-            bert_result['academic_background']
+            bert_result['academic_background'],
+            'academic_background', entity_index
         ),
         'corporate_experience': merge_experience_section(
             gliner_result['corporate_experience'],
-            bert_result['corporate_experience']
+            bert_result['corporate_experience'],
+            'corporate_experience', entity_index
         )
     }
     
     return merged_result
 
-def merge_entity_results(gliner_results: List[Dict[str, Any]], bert_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+def merge_entity_results(gliner_results: List[Dict[str, Any]], bert_results: List[Dict[str, Any]],
+                         entity_index=None) -> List[Dict[str, Any]]:
     """Merge entity extraction results from GLiNER and BERT+Regex approaches"""
     # Create dictionaries for quick lookup by ID
     gliner_dict = {result['id']: result for result in gliner_results}
@@ -125,44 +262,286 @@ def merge_entity_results(gliner_results: List[Dict[str, Any]], bert_results: Lis
     
     merged_results = []
     for person_id in sorted(all_ids):
-        gliner_result = gliner_dict.get(person_id, {
-            'id': person_id,
-            'alias': f'Person_{person_id}',
-            'academic_experience': {'Course': [], 'Program': [], 'Organization': []},
-            'academic_background': {'Organization': [], 'Location': [], 'Education': [], 'Period': []},
-            'corporate_experience': {'Organization': [], 'Location': []}
-        })
+        gliner_result = gliner_dict.get(person_id) or empty_result(person_id, f'Person_{person_id}')
+        bert_result = bert_dict.get(person_id) or empty_result(person_id, f'Person_{person_id}')
         
-        bert_result = bert_dict.get(person_id, {
-            'id': person_id,
-            'alias': f'Person_{person_id}',
-            'academic_experience': {'Course': [], 'Program': [], 'Organization': []},
-            'academic_background': {'Organization': [], 'Location': [], 'Education': [], 'Period': []},
-            'corporate_experience': {'Organization': [], 'Location': []}
-        })
-        
-        merged_result = merge_single_result(gliner_result, bert_result)
+        merged_result = merge_single_result(gliner_result, bert_result, entity_index)
         merged_results.append(merged_result)
     
     return merged_results
 
+def merge_all_results(results_lists: List[List[Dict[str, Any]]], entity_index=None,
+                      processes: int = None) -> List[Dict[str, Any]]:
+    """Merge results from any number of backends, folding them in order
+    
+    With processes set, rows are merged in shards on a process pool (see
+    iter_merged_results).
+    """
+    if processes and (len(results_lists) > 1 or entity_index is not None):
+        return list(iter_merged_results(results_lists, entity_index, processes))
+    merged_results = results_lists[0]
+    if entity_index is not None and len(results_lists) == 1:
+        # A single backend still gets its entities canonicalized
+        return merge_entity_results(merged_results, [], entity_index)
+    for other_results in results_lists[1:]:
+        merged_results = merge_entity_results(merged_results, other_results, entity_index)
+    return merged_results
+
+class RowMerger:
+    """Merges each row as soon as every backend has returned its result
+    
+    Feed it (backend name, results) chunks in any order; add() returns the
+    merged rows that became complete with that chunk.
+    """
+    
+    def __init__(self, backends: List[str]):
+        self.backends = list(backends)
+        self.pending: Dict[Any, Dict[str, Dict[str, Any]]] = {}
+    
+    def add(self, backend: str, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        completed = []
+        for result in results:
+            row = self.pending.setdefault(result['id'], {})
+            row[backend] = result
+            if len(row) == len(self.backends):
+                del self.pending[result['id']]
+                completed.extend(merge_all_results([[row[name]] for name in self.backends]))
+        return completed
+    
+    def flush(self) -> List[Dict[str, Any]]:
+        """Merge rows still missing a backend result (filled with empty results)"""
+        results_lists = [
+            [row[name] for row in self.pending.values() if name in row]
+            for name in self.backends
+        ]
+        self.pending = {}
+        return merge_all_results(results_lists) if any(results_lists) else []
+
 # ============================================================================
-# SECTION 5: FILE PROCESSING FUNCTIONS
+# SECTION 5: SHARDED MERGING
 # ============================================================================
 
-def load_results_from_files(gliner_file: str, bert_file: str) -> tuple:
-    """Load results from JSON files"""
-    with open(gliner_file, 'r', encoding='utf-8') as f:
-        gliner_results = json.load(f)
+# Rows per shard handed to a merge process
+MERGE_SHARD_ROWS = 256
+
+def _in_id_order(results: Iterable[Dict[str, Any]]) -> Iterable[Dict[str, Any]]:
+    """Results in row id order: lists are sorted if needed, other iterables must already be"""
+    if isinstance(results, list) and any(a['id'] > b['id'] for a, b in pairwise(results)):
+        return sorted(results, key=lambda result: result['id'])
+    return results
+
+def shard_results(results_lists: List[Iterable[Dict[str, Any]]],
+                  shard_rows: int = MERGE_SHARD_ROWS) -> Iterator[List[List[Dict[str, Any]]]]:
+    """Split backend results into shards of consecutive row ids
     
-    with open(bert_file, 'r', encoding='utf-8') as f:
-        bert_results = json.load(f)
+    Each shard holds one (possibly empty) results list per backend, so it can
+    be merged with merge_all_results on its own. The inputs are walked side by
+    side in row id order without indexing them by id first; iterators (e.g.
+    rows read from a file) must already be in that order.
+    """
+    iterators = [iter(_in_id_order(results)) for results in results_lists]
+    heads = [next(rows, None) for rows in iterators]
+    while any(head is not None for head in heads):
+        shard = [[] for _ in iterators]
+        for _ in range(shard_rows):
+            ids = [head['id'] for head in heads if head is not None]
+            if not ids:
+                break
+            row_id = min(ids)
+            for k, rows in enumerate(iterators):
+                while heads[k] is not None and heads[k]['id'] == row_id:
+                    shard[k].append(heads[k])
+                    heads[k] = next(rows, None)
+        yield shard
+
+_worker_entity_index = None
+
+def _init_merge_worker(entity_index) -> None:
+    global _worker_entity_index
+    _worker_entity_index = entity_index
+
+def _merge_shard(results_lists: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    return merge_all_results(results_lists, _worker_entity_index)
+
+def iter_merged_results(results_lists: List[Iterable[Dict[str, Any]]], entity_index=None, processes: int = None,
+                        shard_rows: int = MERGE_SHARD_ROWS) -> Iterator[Dict[str, Any]]:
+    """Merge results shard by shard, yielding merged rows in row id order
+    
+    Rows merge independently, so the output equals merge_all_results(). With
+    processes set, shards are merged on a process pool with at most two shards
+    per process in flight; otherwise they are merged here. An entity_index is
+    copied to each worker once and must already hold every form
+    (CanonicalEntityIndex.add_results), or workers would assign their own ids
+    to unseen forms.
+    """
+    shards = shard_results(results_lists, shard_rows)
+    if not processes:
+        for shard in shards:
+            yield from merge_all_results(shard, entity_index)
+        return
     
-    return gliner_results, bert_results
+    ctx = mp.get_context("spawn")
+    with ProcessPoolExecutor(processes, mp_context=ctx, initializer=_init_merge_worker,
+                             initargs=(entity_index,)) as executor:
+        pending = deque()
+        for shard in shards:
+            pending.append(executor.submit(_merge_shard, shard))
+            if len(pending) >= 2 * processes:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
 
-def save_merged_results(merged_results: List[Dict[str, Any]], output_file: str) -> None:
-    """Save merged results to JSON file"""
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(merged_results, f, indent=2, ensure_ascii=False)
+# ============================================================================
+# SECTION 6: FILE PROCESSING FUNCTIONS
+# ============================================================================
+
+RESULT_FORMATS = ('json', 'jsonl', 'parquet')
+
+def results_path(stem: str, fmt: str) -> str:
+    """File path for a results stem (e.g. 'results/merged_entities_results') in a format"""
+    return f"{stem}.{fmt}"
+
+def _parquet_schema():
+    import pyarrow as pa
+    return pa.schema(
+        [('id', pa.int64()), ('alias', pa.string())] + [
+            (section, pa.struct([(category, pa.list_(pa.string())) for category in categories]))
+            for section, categories in RESULT_SCHEMA.items()
+        ]
+    )
+
+class ResultFileWriter:
+    """Writes a results file chunk by chunk, in the order the rows are given
+    
+    The finished file is the same as save_results() writes for all the rows:
+    JSON, JSON Lines or Parquet (one row group per chunk), by extension.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.rows = 0
+        self.parquet = None
+        self.file = None
+        if path.endswith('.parquet'):
+            import pyarrow.parquet as pq
+            self.parquet = pq.ParquetWriter(path, _parquet_schema())
+        else:
+            self.file = open(path, 'w', encoding='utf-8')
+            if not path.endswith('.jsonl'):
+                self.file.write('[')
+    
+    def write(self, results: List[Dict[str, Any]]) -> None:
+        if self.parquet is not None:
+            import pyarrow as pa
+            if results:
+                self.parquet.write_table(pa.Table.from_pylist(results, schema=_parquet_schema()))
+        elif self.path.endswith('.jsonl'):
+            for result in results:
+                self.file.write(json.dumps(result, ensure_ascii=False, separators=(',', ':')))
+                self.file.write('\n')
+        else:
+            # Same layout as json.dump(results, f, indent=2)
+            for i, result in enumerate(results):
+                self.file.write(',\n  ' if self.rows or i else '\n  ')
+                self.file.write(json.dumps(result, indent=2, ensure_ascii=False).replace('\n', '\n  '))
+        self.rows += len(results)
+    
+    def close(self) -> None:
+        if self.parquet is not None:
+            self.parquet.close()
+        else:
+            if not self.path.endswith('.jsonl'):
+                self.file.write('\n]' if self.rows else ']')
+            self.file.close()
+
+def save_results(results: List[Dict[str, Any]], path: str) -> None:
+    """Save results as JSON, JSON Lines (one compact row per line) or Parquet, by extension"""
+    writer = ResultFileWriter(path)
+    try:
+        writer.write(results)
+    finally:
+        writer.close()
+
+def load_results(path: str) -> List[Dict[str, Any]]:
+    """Load results saved by save_results"""
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        return pq.read_table(path).to_pylist()
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith('.jsonl'):
+            return [json.loads(line) for line in f if line.strip()]
+        return json.load(f)
+
+def iter_results(path: str, batch_rows: int = MERGE_SHARD_ROWS) -> Iterator[Dict[str, Any]]:
+    """Yield the rows of a results file one by one
+    
+    JSON Lines and Parquet files are read incrementally; a JSON array has to
+    be loaded whole.
+    """
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_rows):
+            yield from batch.to_pylist()
+    elif path.endswith('.jsonl'):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        yield from load_results(path)
+
+class SavedResults:
+    """Results already written to a file, read back each time they are iterated"""
+    
+    def __init__(self, path: str, rows: int):
+        self.path = path
+        self.rows = rows
+    
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter_results(self.path)
+    
+    def __len__(self) -> int:
+        return self.rows
+
+def load_results_from_files(*files: str) -> tuple:
+    """Load results from files (e.g. GLiNER and BERT+Regex), one list per file"""
+    return tuple(load_results(path) for path in files)
+
+def save_merged_results(merged_results: Iterable[Dict[str, Any]], output_file: str,
+                        chunk_rows: int = MERGE_SHARD_ROWS) -> int:
+    """Save merged results (format chosen by the file extension); returns the row count
+    
+    merged_results can be any iterable of rows, e.g. iter_merged_results():
+    rows are written in chunks as they arrive instead of being collected first.
+    """
+    writer = ResultFileWriter(output_file)
+    try:
+        rows = iter(merged_results)
+        while chunk := list(islice(rows, chunk_rows)):
+            writer.write(chunk)
+    finally:
+        writer.close()
+    return writer.rows
+
+class AsyncResultWriter:
+    """Writes result files on a background thread so later stages do not wait on disk
+    
+    Results handed to save() must not be modified afterwards.
+    """
+    
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.futures = []
+    
+    def save(self, results: List[Dict[str, Any]], path: str) -> None:
+        self.futures.append((path, len(results), self.executor.submit(save_results, results, path)))
+    
+    def close(self) -> None:
+        """Wait for pending writes and report them (re-raises the first write error)"""
+        self.executor.shutdown(wait=True)
+        for path, n_rows, future in self.futures:
+            future.result()
+            print(f"Saved {n_rows} rows to {path}")
+        self.futures = []
 
 # Main execution logic moved to main.py for testing
\ No newline at end of file
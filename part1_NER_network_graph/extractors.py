@@ -0,0 +1,427 @@
+"""
+EXTRACTION BACKENDS
+===================
+Shared result structure and a common batch-in/batch-out interface for the
+GLiNER, BERT+Regex and LangExtract (LLM) engines.
+
+Every backend takes a preprocessed DataFrame batch and returns one result
+dict per row, in row order, shaped like empty_result(). Backends import their
+engine lazily so each one is only needed when selected.
+"""
+
+import os
+import time
+import queue
+import threading
+import traceback
+import multiprocessing as mp
+from concurrent.futures import ThreadPoolExecutor
+from checkpoints import StageCheckpoint, checkpoint_path
+
+# ============================================================================
+# SECTION 1: SHARED RESULT STRUCTURE
+# ============================================================================
+
+RESULT_SCHEMA = {
+    "academic_experience": ("Course", "Program", "Organization"),
+    "academic_background": ("Organization", "Location", "Education", "Period"),
+    "corporate_experience": ("Organization", "Location")
+}
+
+# (section, category) -> entity type; categories of the same type share entities
+ENTITY_TYPES = {
+    ("academic_experience", "Course"): "course",
+    ("academic_experience", "Program"): "program",
+    ("academic_experience", "Organization"): "university",
+    ("academic_background", "Organization"): "university",
+    ("academic_background", "Education"): "degree",
+    ("academic_background", "Period"): "year",
+    ("academic_background", "Location"): "location",
+    ("corporate_experience", "Organization"): "company",
+    ("corporate_experience", "Location"): "location"
+}
+
+def empty_result(prof_id, alias):
+    """Create the empty result structure for one professor"""
+    return {
+        "id": prof_id,
+        "alias": alias,
+        **{
+            section: {category: [] for category in categories}
+            for section, categories in RESULT_SCHEMA.items()
+        }
+    }
+
+# ============================================================================
+# SECTION 2: BACKEND INTERFACE
+# ============================================================================
+
+class Extractor:
+    """Base class for extraction backends
+
+    Subclasses implement _extract(df_batch). extract_batch wraps it with
+    timing so every backend reports throughput the same way.
+    """
+    name = "extractor"
+    # Bump when a backend's extraction logic changes, so incremental runs redo its rows
+    code_version = 1
+    # Rows the backend wants per extract_batch call (callers slicing batches keep at least this many)
+    rows_per_call = 1
+
+    def __init__(self):
+        self.rows_processed = 0
+        self.seconds = 0.0
+
+    def extract_batch(self, df_batch):
+        """Return one result dict per row of df_batch, in row order"""
+        start = time.perf_counter()
+        results = self._extract(df_batch)
+        self.seconds += time.perf_counter() - start
+        self.rows_processed += len(df_batch)
+        return results
+
+    def _extract(self, df_batch):
+        raise NotImplementedError
+
+    @classmethod
+    def thread_options(cls, options, threads):
+        """Adjust constructor kwargs to run within a budget of threads"""
+        return options
+
+    @classmethod
+    def version(cls, options):
+        """Identify the model and settings behind this backend's results"""
+        return f"{cls.name}/v{cls.code_version}"
+
+    def close(self):
+        """Release models, pools and connections"""
+
+    def stats(self):
+        rate = self.rows_processed / self.seconds if self.seconds else 0.0
+        return f"{self.name}: {self.rows_processed} rows in {self.seconds:.1f}s ({rate:.1f} rows/s)"
+
+# ============================================================================
+# SECTION 3: BACKENDS
+# ============================================================================
+
+class GLiNERExtractor(Extractor):
+    name = "gliner"
+
+    def __init__(self, batch_size=8, service=None):
+        """
+        Args:
+            batch_size: Texts per GLiNER forward pass
+            service: 'host:port' of a running gliner_service.py worker (None = in-process model)
+        """
+        super().__init__()
+        from gliner_service import get_gliner_backend
+        self.model = get_gliner_backend(service)
+        self.batch_size = batch_size
+        # Texts are batched across rows per section, so larger calls leave fewer part-filled batches
+        self.rows_per_call = 16 * batch_size
+
+    def _extract(self, df_batch):
+        from gliner_extractor import extract_entities_gliner
+        return extract_entities_gliner(df_batch, model=self.model, batch_size=self.batch_size)
+
+    @classmethod
+    def version(cls, options):
+        from gliner_extractor import GLINER_MODEL, THRESHOLD, MAX_CHUNK_WORDS, CHUNK_OVERLAP_WORDS
+        return (f"{super().version(options)}/{GLINER_MODEL}/threshold={THRESHOLD}"
+                f"/chunks={MAX_CHUNK_WORDS},{CHUNK_OVERLAP_WORDS}")
+
+    def close(self):
+        if hasattr(self.model, "close"):
+            self.model.close()
+
+class BertRegexExtractor(Extractor):
+    name = "bert_regex"
+
+    def __init__(self, workers=1, torch_threads=None, rows_per_call=64, **processor_options):
+        """
+        Args:
+            workers: Worker processes (> 1 uses ParallelHybridNERProcessor)
+            torch_threads: Torch threads per worker process
+            rows_per_call: Rows whose lines share one batched BERT call (per worker)
+            **processor_options: Passed to HybridNERProcessor
+        """
+        super().__init__()
+        from bert_extractor import HybridNERProcessor, ParallelHybridNERProcessor
+        if workers > 1:
+            self.processor = ParallelHybridNERProcessor(
+                n_workers=workers, torch_threads=torch_threads, **processor_options
+            )
+        else:
+            self.processor = HybridNERProcessor(**processor_options)
+        self.rows_per_call = rows_per_call * workers
+
+    @classmethod
+    def version(cls, options):
+        from bert_extractor import HybridNERProcessor
+        regex_only = ",".join(sorted(options.get("regex_only_types", ()))) or "none"
+        dedup = options.get("dedup_scope", "document")
+        return f"{super().version(options)}/{HybridNERProcessor.MODEL_NAME}/regex_only={regex_only}/dedup={dedup}"
+
+    @classmethod
+    def thread_options(cls, options, threads):
+        # Split the budget between BERT worker processes unless set explicitly
+        workers = options.get("workers", 1)
+        if workers > 1 and options.get("torch_threads") is None:
+            return {**options, "torch_threads": max(1, threads // workers)}
+        return options
+
+    def _extract(self, df_batch):
+        professors = []
+        results = []
+        for idx, row in df_batch.iterrows():
+            html_content = row.get('full_info', '')
+            alias = row.get('alias', f'Professor_{idx}')
+            if html_content:
+                professors.append((html_content, idx, alias))
+            results.append(empty_result(idx, alias))
+
+        # Rows without HTML keep their empty result
+        position = {idx: pos for pos, idx in enumerate(df_batch.index)}
+        for i in range(0, len(professors), self.rows_per_call):
+            chunk = professors[i:i + self.rows_per_call]
+            print(f"{self.name}: professors {chunk[0][1]+1}-{chunk[-1][1]+1}")
+            for result in self.processor.process_professors(chunk):
+                results[position[result["id"]]] = result
+
+        return results
+
+    def close(self):
+        self.processor.close()
+
+class LangExtractExtractor(Extractor):
+    """LLM backend built on the langextract experiment (needs LANGEXTRACT_API_KEY)"""
+    name = "langextract"
+
+    def _extract(self, df_batch):
+        from langextract_test.langextract_extractor import extract_entities_langextract
+        return extract_entities_langextract(df_batch, start_idx=0, batch_size=len(df_batch))
+
+BACKENDS = {
+    GLiNERExtractor.name: GLiNERExtractor,
+    BertRegexExtractor.name: BertRegexExtractor,
+    LangExtractExtractor.name: LangExtractExtractor
+}
+
+def create_extractors(names, options=None, checkpoint_dir=None, resume=False, run_id=None):
+    """Instantiate backends by name; options maps a backend name to its kwargs
+
+    With checkpoint_dir set every backend records finished rows in
+    <checkpoint_dir>/<name>.jsonl; resume=True reuses the rows already there
+    when the checkpoint was written for the same backend version and run_id.
+    """
+    options = options or {}
+    unknown = [n for n in names if n not in BACKENDS]
+    if unknown:
+        raise ValueError(f"Unknown extraction backends {unknown}; choose from {list(BACKENDS)}")
+    if checkpoint_dir:
+        return [
+            CheckpointedExtractor(n, options.get(n, {}), checkpoint_path(checkpoint_dir, n), resume, run_id)
+            for n in names
+        ]
+    return [BACKENDS[n](**options.get(n, {})) for n in names]
+
+# ============================================================================
+# SECTION 4: CHECKPOINTED BACKENDS
+# ============================================================================
+
+class CheckpointedExtractor(Extractor):
+    """Wraps a backend so finished rows are appended to a checkpoint file
+
+    Rows already in the checkpoint are read back from it unless their alias or
+    full_info changed since (by pipeline_manifest.row_hash); the rest are
+    extracted checkpoint_rows (or the backend's rows_per_call, if larger) at a
+    time and appended as they finish. The wrapped backend is only loaded once
+    there is a row left to extract.
+    """
+
+    def __init__(self, name, options, path, resume=False, run_id=None, checkpoint_rows=32):
+        super().__init__()
+        self.name = name
+        self.backend = BACKENDS[name]
+        self.options = options
+        self.checkpoint_rows = checkpoint_rows
+        self.checkpoint = StageCheckpoint(
+            path, {"backend": self.backend.version(options), "run": run_id}, resume
+        )
+        self.rows_restored = 0
+        self.extractor = None
+
+    @property
+    def rows_per_call(self):
+        return max(self.checkpoint_rows, self.extractor.rows_per_call if self.extractor else 1)
+
+    def _extract(self, df_batch):
+        from pipeline_manifest import batch_hashes
+        hashes = batch_hashes(df_batch)
+        restored = [idx for idx, h in hashes.items() if self.checkpoint.is_done(idx, h)]
+        todo = df_batch[~df_batch.index.isin(restored)]
+        self.rows_restored += len(restored)
+        results = self.checkpoint.read(restored)
+
+        if len(todo) and self.extractor is None:
+            self.extractor = self.backend(**self.options)
+        step = self.rows_per_call
+        for i in range(0, len(todo), step):
+            extracted = self.extractor.extract_batch(todo.iloc[i:i + step])
+            self.checkpoint.append(extracted, hashes)
+            results.update((result['id'], result) for result in extracted)
+
+        return [results[idx] for idx in df_batch.index]
+
+    def close(self):
+        if self.extractor is not None:
+            self.extractor.close()
+        self.checkpoint.close()
+
+    def stats(self):
+        extracted = self.extractor.stats() if self.extractor else f"{self.name}: 0 rows extracted"
+        return f"{extracted}, {self.rows_restored} rows restored from checkpoint"
+
+# ============================================================================
+# SECTION 5: RUNNING SEVERAL BACKENDS
+# ============================================================================
+
+def run_extractors(extractors, df_batch, concurrent=True):
+    """Run every backend on the same batch
+
+    Returns {backend name: results}. With concurrent=True backends run in
+    threads (model inference releases the GIL).
+    """
+    if concurrent and len(extractors) > 1:
+        with ThreadPoolExecutor(max_workers=len(extractors)) as executor:
+            futures = {e.name: executor.submit(e.extract_batch, df_batch) for e in extractors}
+            return {name: future.result() for name, future in futures.items()}
+    return {e.name: e.extract_batch(df_batch) for e in extractors}
+
+# ============================================================================
+# SECTION 6: BACKENDS IN SEPARATE PROCESSES
+# ============================================================================
+
+def limit_threads(threads):
+    """Cap the BLAS/OpenMP and torch thread pools of the current process"""
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(threads)
+
+def _backend_process(name, options, threads, chunk_rows, checkpoint, tasks, results):
+    """Worker process: build one backend and stream its results back chunk by chunk
+
+    Messages put on results are (kind, backend name, payload) with kind one of
+    'rows' (list of row results), 'done' (stats line) or 'error' (traceback).
+    checkpoint holds create_extractors' checkpoint kwargs.
+    """
+    try:
+        limit_threads(threads)
+        extractor = create_extractors([name], {name: options}, **checkpoint)[0]
+        try:
+            while (df_batch := tasks.get()) is not None:
+                i = 0
+                while i < len(df_batch):
+                    step = max(chunk_rows, extractor.rows_per_call)
+                    results.put(("rows", name, extractor.extract_batch(df_batch.iloc[i:i + step])))
+                    i += step
+        finally:
+            extractor.close()
+        results.put(("done", name, extractor.stats()))
+    except Exception:
+        results.put(("error", name, traceback.format_exc()))
+
+class ProcessExtractorPool:
+    """Runs each backend in its own process with a share of the CPU threads
+
+    run(batches) sends every batch to all backend processes and yields
+    (backend name, row results) as soon as a process finishes a chunk of rows,
+    so callers can merge rows while the other backends are still working.
+    """
+
+    def __init__(self, names, options=None, total_threads=None, chunk_rows=32, checkpoint=None):
+        """
+        Args:
+            names: Backend names from BACKENDS
+            options: Maps a backend name to its constructor kwargs
+            total_threads: Threads shared between the backends (default: all cores)
+            chunk_rows: Rows extracted per result message
+            checkpoint: create_extractors checkpoint kwargs (checkpoint_dir, resume, run_id)
+        """
+        options = options or {}
+        unknown = [n for n in names if n not in BACKENDS]
+        if unknown:
+            raise ValueError(f"Unknown extraction backends {unknown}; choose from {list(BACKENDS)}")
+        total_threads = total_threads or os.cpu_count() or 1
+        self.threads = max(1, total_threads // len(names))
+        self.names = list(names)
+        self.stats = []
+
+        # spawn: each backend loads its own torch/tokenizer state
+        ctx = mp.get_context("spawn")
+        self.results = ctx.Queue()
+        self.tasks = {name: ctx.Queue(maxsize=2) for name in self.names}
+        self.processes = {
+            name: ctx.Process(
+                target=_backend_process,
+                args=(name, BACKENDS[name].thread_options(options.get(name, {}), self.threads),
+                      self.threads, chunk_rows, checkpoint or {}, self.tasks[name], self.results),
+                name=f"extractor-{name}"
+            )
+            for name in self.names
+        }
+        for process in self.processes.values():
+            process.start()
+
+    def _feed(self, batches, errors):
+        """Send every batch to every backend, then a None sentinel"""
+        try:
+            for df_batch in batches:
+                for task_queue in self.tasks.values():
+                    task_queue.put(df_batch)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            for task_queue in self.tasks.values():
+                task_queue.put(None)
+
+    def run(self, batches):
+        """Yield (backend name, row results) in completion order"""
+        errors = []
+        feeder = threading.Thread(target=self._feed, args=(batches, errors), daemon=True)
+        feeder.start()
+
+        running = set(self.names)
+        while running:
+            try:
+                kind, name, payload = self.results.get(timeout=1)
+            except queue.Empty:
+                dead = [n for n in running if not self.processes[n].is_alive()]
+                if dead:
+                    raise RuntimeError(f"Extraction process for {dead} exited unexpectedly")
+                continue
+
+            if kind == "rows":
+                yield name, payload
+            elif kind == "done":
+                running.discard(name)
+                self.stats.append(payload)
+            else:
+                raise RuntimeError(f"Extraction backend {name} failed:\n{payload}")
+
+        feeder.join()
+        if errors:
+            raise errors[0]
+
+    def close(self):
+        # Batches a failed backend never read must not block interpreter exit
+        for task_queue in self.tasks.values():
+            task_queue.cancel_join_thread()
+        for process in self.processes.values():
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
@@ -5,129 +5,269 @@ Uses GLiNER model for zero-shot named entity recognition.
 Extracts structured entities from preprocessed biography sections.
 """
 
+import re
+import threading
 from gliner import GLiNER
+from extractors import empty_result
 
 # ============================================================================
 # SECTION 1: MODEL INITIALIZATION
 # ============================================================================
 
-def extract_entities_gliner(df_processed):
-    """
-    Extract entities using GLiNER approach
-    
-    Args:
-        df_processed: DataFrame with preprocessed sections
-        
-    Returns:
-        List of dictionaries with extracted entities
-    """
-    
-    # Load GLiNER model
-    model = GLiNER.from_pretrained("urchade/gliner_mediumv2.1")
+GLINER_MODEL = "urchade/gliner_mediumv2.1"
+
+# Process-wide registry: each model is loaded once, on first use
+_MODEL_REGISTRY = {}
+_REGISTRY_LOCK = threading.Lock()
+
+def load_gliner_model(model_name=GLINER_MODEL):
+    """Load a GLiNER model from disk/hub (always a fresh load)"""
+    model = GLiNER.from_pretrained(model_name)
     model.eval()
     print("GLiNER model loaded!")
+    return model
+
+def get_gliner_model(model_name=GLINER_MODEL):
+    """Return the shared GLiNER model, loading it on first use"""
+    with _REGISTRY_LOCK:
+        if model_name not in _MODEL_REGISTRY:
+            _MODEL_REGISTRY[model_name] = load_gliner_model(model_name)
+        return _MODEL_REGISTRY[model_name]
 
 # ============================================================================
 # SECTION 2: ENTITY LABEL DEFINITIONS
 # ============================================================================
 
-    # Define labels for each column
-    academic_experience_labels = [
-        "subject or course taught by professor", 
-        "academic program or degree level taught", 
-        "teaching institution or university where professor works"
-    ]
+# Labels for each column, mapped to the output category they fill
+SECTION_LABELS = {
+    "academic_experience": {
+        "subject or course taught by professor": "Course",
+        "academic program or degree level taught": "Program",
+        "teaching institution or university where professor works": "Organization"
+    },
+    "academic_background": {
+        "educational institution where studied": "Organization",
+        "location of educational institution": "Location",
+        "academic degree or qualification earned": "Education",
+        "years of study or graduation year": "Period"
+    },
+    "corporate_experience": {
+        "employer company or organization": "Organization",
+        "workplace location or company headquarters": "Location"
+    }
+}
 
-    academic_background_labels = [
-        "educational institution where studied", 
-        "location of educational institution", 
-        "academic degree or qualification earned", 
-        "years of study or graduation year"
-    ]
+THRESHOLD = 0.4
 
-    corporate_experience_labels = [
-        "employer company or organization", 
-        "workplace location or company headquarters"
-    ]
+# GLiNER's window is 384 word tokens; stay below it with some headroom
+MAX_CHUNK_WORDS = 256
+CHUNK_OVERLAP_WORDS = 32
 
 # ============================================================================
-# SECTION 3: MAIN PROCESSING PIPELINE
+# SECTION 3: BATCHED INFERENCE
 # ============================================================================
 
-    # Process each row and extract entities
-    results = []
-
-    for idx, row in df_processed.iterrows():
-        row_result = {
-            "id": idx,
-            "alias": row.get('alias', ''),
-            "academic_experience": {
-                "Course": [],
-                "Program": [],
-                "Organization": []
-            },
-            "academic_background": {
-                "Organization": [],
-                "Location": [],
-                "Education": [],
-                "Period": []
-            },
-            "corporate_experience": {
-                "Organization": [],
-                "Location": []
-            }
-        }
+def predict_entities_batch(model, texts, labels, threshold=THRESHOLD, batch_size=8):
+    """
+    Run GLiNER on many texts sharing one label set
+
+    Returns one entity list per input text, in input order.
+    """
+    if not texts:
+        return []
+
+    if hasattr(model, "inference"):
+        return model.inference(texts, labels, threshold=threshold, batch_size=batch_size)
+
+    # Older GLiNER releases only expose batch_predict_entities
+    predictions = []
+    for i in range(0, len(texts), batch_size):
+        predictions.extend(model.batch_predict_entities(texts[i:i + batch_size], labels, threshold=threshold))
+    return predictions
 
 # ============================================================================
-# SECTION 4: ENTITY EXTRACTION BY SECTION
+# SECTION 4: LONG-TEXT CHUNKING
 # ============================================================================
-        
-        # Academic Experience NER
-        if row['academic_experience'].strip():
-            entities = model.predict_entities(row['academic_experience'], academic_experience_labels, threshold=0.4)
-            for entity in entities:
-                if entity["label"] == "subject or course taught by professor":
-                    row_result["academic_experience"]["Course"].append(entity["text"])
-                elif entity["label"] == "academic program or degree level taught":
-                    row_result["academic_experience"]["Program"].append(entity["text"])
-                elif entity["label"] == "teaching institution or university where professor works":
-                    row_result["academic_experience"]["Organization"].append(entity["text"])
-        
-        # Academic Background NER
-        if row['academic_background'].strip():
-            entities = model.predict_entities(row['academic_background'], academic_background_labels, threshold=0.4)
-            for entity in entities:
-                if entity["label"] == "educational institution where studied":
-                    row_result["academic_background"]["Organization"].append(entity["text"])
-                elif entity["label"] == "location of educational institution":
-                    row_result["academic_background"]["Location"].append(entity["text"])
-                elif entity["label"] == "academic degree or qualification earned":
-                    row_result["academic_background"]["Education"].append(entity["text"])
-                elif entity["label"] == "years of study or graduation year":
-                    row_result["academic_background"]["Period"].append(entity["text"])
-        
-        # Corporate Experience NER
-        if row['corporate_experience'].strip():
-            entities = model.predict_entities(row['corporate_experience'], corporate_experience_labels, threshold=0.4)
+
+WORD = re.compile(r"\S+")
+SENTENCE_BOUNDARY = re.compile(r"[.!?;]+\s+|\s*[•·]\s*|\n+")
+
+def _text_units(text, piece_words):
+    """Split text into sentence spans (start, end, n_words)
+
+    Sentences longer than piece_words are cut into word pieces so that no
+    unit is larger than a chunk.
+    """
+    units = []
+    start = 0
+    boundaries = [m.end() for m in SENTENCE_BOUNDARY.finditer(text)] + [len(text)]
+    for end in boundaries:
+        if end <= start:
+            continue
+        words = list(WORD.finditer(text, start, end))
+        if len(words) > piece_words:
+            for i in range(0, len(words), piece_words):
+                piece = words[i:i + piece_words]
+                units.append((piece[0].start(), piece[-1].end(), len(piece)))
+        elif words:
+            units.append((start, end, len(words)))
+        start = end
+    return units
+
+def chunk_text(text, max_words=MAX_CHUNK_WORDS, overlap_words=CHUNK_OVERLAP_WORDS):
+    """
+    Split text into sentence-aligned chunks of at most max_words words
+
+    Consecutive chunks share up to overlap_words words of trailing sentences.
+
+    Returns:
+        List of (char_offset, chunk_text) tuples
+    """
+    if len(WORD.findall(text)) <= max_words:
+        return [(0, text)]
+
+    overlap_words = min(overlap_words, max_words - 1)
+    units = _text_units(text, overlap_words if overlap_words > 0 else max_words)
+
+    spans = []
+    current, current_words = [], 0
+    for unit in units:
+        if current and current_words + unit[2] > max_words:
+            spans.append((current[0][0], current[-1][1]))
+            # Carry trailing sentences into the next chunk as overlap
+            carry, carry_words = [], 0
+            for prev in reversed(current):
+                if carry_words + prev[2] > overlap_words:
+                    break
+                carry.insert(0, prev)
+                carry_words += prev[2]
+            current, current_words = carry, carry_words
+            while current and current_words + unit[2] > max_words:
+                current_words -= current.pop(0)[2]
+        current.append(unit)
+        current_words += unit[2]
+    if current:
+        spans.append((current[0][0], current[-1][1]))
+
+    return [(start, text[start:end]) for start, end in spans]
+
+def merge_chunk_entities(text, chunk_entities):
+    """
+    Merge entities predicted on overlapping chunks of one text
+
+    Args:
+        text: The original full text
+        chunk_entities: List of (char_offset, entities) per chunk
+
+    Returns:
+        Non-overlapping entities with offsets into the full text
+    """
+    candidates = []
+    for offset, entities in chunk_entities:
+        for entity in entities:
+            start, end = entity["start"] + offset, entity["end"] + offset
+            candidates.append({**entity, "start": start, "end": end, "text": text[start:end]})
+
+    # Same span seen by two chunks, or a span cut at a chunk edge: keep best score
+    candidates.sort(key=lambda e: (-e.get("score", 0), e["start"]))
+    merged = []
+    for entity in candidates:
+        if all(entity["end"] <= kept["start"] or entity["start"] >= kept["end"] for kept in merged):
+            merged.append(entity)
+
+    return sorted(merged, key=lambda e: e["start"])
+
+def predict_entities_chunked(model, texts, labels, threshold=THRESHOLD, batch_size=8,
+                             max_words=MAX_CHUNK_WORDS, overlap_words=CHUNK_OVERLAP_WORDS):
+    """
+    Run GLiNER on texts of any length by batching their overlapping chunks
+
+    Returns one entity list per input text, in input order.
+    """
+    owners, offsets, chunks = [], [], []
+    for i, text in enumerate(texts):
+        for offset, chunk in chunk_text(text, max_words, overlap_words):
+            owners.append(i)
+            offsets.append(offset)
+            chunks.append(chunk)
+
+    predictions = predict_entities_batch(model, chunks, labels, threshold, batch_size)
+
+    per_text = [[] for _ in texts]
+    for owner, offset, entities in zip(owners, offsets, predictions):
+        per_text[owner].append((offset, entities))
+
+    return [
+        entities[0][1] if len(entities) == 1 else merge_chunk_entities(text, entities)
+        for text, entities in zip(texts, per_text)
+    ]
+
+# ============================================================================
+# SECTION 5: MAIN PROCESSING PIPELINE
+# ============================================================================
+
+def extract_entities_gliner(df_processed, model=None, batch_size=8,
+                            max_words=MAX_CHUNK_WORDS, overlap_words=CHUNK_OVERLAP_WORDS):
+    """
+    Extract entities using GLiNER approach
+
+    Texts are grouped by section (each section shares one label set), split
+    into overlapping chunks of at most max_words words, and sent to the model
+    in batches of batch_size. Chunk spans are merged back by character offset
+    and routed to their rows.
+
+    Args:
+        df_processed: DataFrame with preprocessed sections
+        model: GLiNER model or service client (shared registry model if None)
+        batch_size: Number of texts per GLiNER forward pass
+        max_words: Longest chunk passed to the model, in words
+        overlap_words: Words shared by consecutive chunks of a long text
+
+    Returns:
+        List of dictionaries with extracted entities
+    """
+
+    # Load GLiNER model
+    if model is None:
+        model = get_gliner_model()
+
+    # Create the result skeleton for every row
+    results = [
+        empty_result(idx, row.get('alias', ''))
+        for idx, row in df_processed.iterrows()
+    ]
+
+    # Entity extraction by section, batched across rows
+    for section, label_map in SECTION_LABELS.items():
+        positions, texts = [], []
+        for pos, text in enumerate(df_processed[section]):
+            if text.strip():
+                positions.append(pos)
+                texts.append(text)
+
+        predictions = predict_entities_chunked(
+            model, texts, list(label_map), batch_size=batch_size,
+            max_words=max_words, overlap_words=overlap_words
+        )
+
+        for pos, entities in zip(positions, predictions):
+            section_result = results[pos][section]
             for entity in entities:
-                if entity["label"] == "employer company or organization":
-                    row_result["corporate_experience"]["Organization"].append(entity["text"])
-                elif entity["label"] == "workplace location or company headquarters":
-                    row_result["corporate_experience"]["Location"].append(entity["text"])
+                category = label_map.get(entity["label"])
+                if category:
+                    section_result[category].append(entity["text"])
+
+        print(f"{section}: processed {len(texts)} texts")
 
 # ============================================================================
-# SECTION 5: POST-PROCESSING AND OUTPUT
+# SECTION 6: POST-PROCESSING AND OUTPUT
 # ============================================================================
-        
-        # Remove duplicates from each list
+
+    # Remove duplicates from each list
+    for row_result in results:
         for section in row_result.values():
             if isinstance(section, dict):
                 for key, value_list in section.items():
                     section[key] = list(set(value_list))  # Remove duplicates
-        
-        results.append(row_result)
-        
-        if idx % 50 == 0:
-            print(f"Processed {idx} rows...")
 
-    return results
\ No newline at end of file
+    return results
@@ -0,0 +1,212 @@
+"""
+GLINER EXTRACTION SERVICE
+=========================
+Long-lived local worker that keeps the GLiNER model in memory.
+Pipeline runs and experiments connect over a local socket instead of
+reloading the model on every start.
+
+Start the worker:   python gliner_service.py --port 6011
+Use it from main:   python main.py --gliner-service localhost:6011
+
+Requests are pickled, so the service only listens on loopback addresses and
+clients must prove they hold the random key the service writes to a file only
+its user can read (AUTHKEY_PATH, or GLINER_SERVICE_KEY_FILE).
+"""
+
+import os
+import socket
+import secrets
+import argparse
+import ipaddress
+from multiprocessing.connection import Listener, Client
+from multiprocessing import AuthenticationError
+
+import pandas as pd
+from gliner_extractor import GLINER_MODEL, get_gliner_model, extract_entities_gliner
+
+DEFAULT_ADDRESS = ("localhost", 6011)
+AUTHKEY_PATH = os.getenv("GLINER_SERVICE_KEY_FILE", os.path.join(os.path.expanduser("~"), ".gliner_service.key"))
+
+# ============================================================================
+# SECTION 1: ADDRESS HELPERS
+# ============================================================================
+
+def parse_address(address):
+    """Parse 'host:port' (or a (host, port) tuple) into a socket address"""
+    if address is None:
+        return DEFAULT_ADDRESS
+    if isinstance(address, tuple):
+        return address
+    host, _, port = address.rpartition(":")
+    return (host or "localhost", int(port))
+
+def check_loopback(address):
+    """Raise ValueError unless every address the host resolves to is a loopback one"""
+    host, port = address
+    try:
+        ips = {info[4][0] for info in socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP)}
+    except socket.gaierror as e:
+        raise ValueError(f"Cannot resolve GLiNER service host {host!r}: {e}") from None
+    if not all(ipaddress.ip_address(ip.split("%")[0]).is_loopback for ip in ips):
+        raise ValueError(f"GLiNER service host {host!r} is not a loopback address; "
+                         "requests are unpickled, so it only runs locally")
+
+# ============================================================================
+# SECTION 2: AUTHENTICATION KEY
+# ============================================================================
+
+def create_authkey(path=AUTHKEY_PATH):
+    """Write a new random key readable only by the current user, and return it"""
+    key = secrets.token_hex(32)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if os.path.exists(path):
+        os.remove(path)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        f.write(key)
+    return key.encode()
+
+def read_authkey(path=AUTHKEY_PATH):
+    """Read the key of a running service, refusing files other users can access"""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"GLiNER service key {path} not found; is gliner_service.py running?")
+    if os.name == "posix" and os.stat(path).st_mode & 0o077:
+        raise PermissionError(f"GLiNER service key {path} is accessible by other users")
+    with open(path, 'r') as f:
+        return f.read().strip().encode()
+
+# ============================================================================
+# SECTION 3: SERVER
+# ============================================================================
+
+def handle_request(model, request):
+    """Run one request against the loaded model"""
+    op = request.get("op")
+
+    if op == "ping":
+        return {"ok": True}
+
+    if op == "inference":
+        predictions = model.inference(
+            request["texts"], request["labels"],
+            threshold=request.get("threshold", 0.5),
+            batch_size=request.get("batch_size", 8)
+        )
+        return {"ok": True, "predictions": predictions}
+
+    if op == "extract":
+        # Rows are dicts with 'alias' and the three preprocessed section columns
+        df = pd.DataFrame(request["rows"], index=request.get("index"))
+        results = extract_entities_gliner(df, model=model, batch_size=request.get("batch_size", 8))
+        return {"ok": True, "results": results}
+
+    return {"ok": False, "error": f"Unknown op: {op}"}
+
+def serve(address=None, model_name=GLINER_MODEL, authkey_path=AUTHKEY_PATH):
+    """Load the model once and answer requests until a 'shutdown' op arrives
+
+    A new key is written to authkey_path on every start.
+    """
+    address = parse_address(address)
+    check_loopback(address)
+    model = get_gliner_model(model_name)
+
+    with Listener(address, authkey=create_authkey(authkey_path)) as listener:
+        print(f"GLiNER service listening on {address[0]}:{address[1]}")
+        while True:
+            try:
+                conn = listener.accept()
+            except (AuthenticationError, EOFError, ConnectionError) as e:
+                print(f"Rejected a GLiNER service client: {e!r}")
+                continue
+            with conn:
+                try:
+                    while True:
+                        request = conn.recv()
+                        if request.get("op") == "shutdown":
+                            conn.send({"ok": True})
+                            print("GLiNER service shutting down")
+                            return
+                        try:
+                            conn.send(handle_request(model, request))
+                        except Exception as e:
+                            conn.send({"ok": False, "error": str(e)})
+                except EOFError:
+                    # Client disconnected; wait for the next one
+                    continue
+
+# ============================================================================
+# SECTION 4: CLIENT
+# ============================================================================
+
+class GLiNERClient:
+    """
+    Client for a running GLiNER service
+
+    Exposes the same inference() method as a GLiNER model, so it can be passed
+    as the model to extract_entities_gliner (chunking and batching stay local).
+    """
+
+    def __init__(self, address=None, authkey_path=AUTHKEY_PATH):
+        self.address = parse_address(address)
+        check_loopback(self.address)
+        self.conn = Client(self.address, authkey=read_authkey(authkey_path))
+
+    def _call(self, request):
+        self.conn.send(request)
+        response = self.conn.recv()
+        if not response.get("ok"):
+            raise RuntimeError(f"GLiNER service error: {response.get('error')}")
+        return response
+
+    def ping(self):
+        return self._call({"op": "ping"})["ok"]
+
+    def inference(self, texts, labels, threshold=0.5, batch_size=8):
+        return self._call({
+            "op": "inference", "texts": list(texts), "labels": list(labels),
+            "threshold": threshold, "batch_size": batch_size
+        })["predictions"]
+
+    def predict_entities(self, text, labels, threshold=0.5):
+        return self.inference([text], labels, threshold=threshold)[0]
+
+    def extract_rows(self, df_processed, batch_size=8):
+        """Send preprocessed rows to the service and get row results back"""
+        columns = ["alias", "academic_experience", "academic_background", "corporate_experience"]
+        return self._call({
+            "op": "extract",
+            "rows": df_processed[columns].to_dict("records"),
+            "index": df_processed.index.tolist(),
+            "batch_size": batch_size
+        })["results"]
+
+    def shutdown(self):
+        self._call({"op": "shutdown"})
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+def get_gliner_backend(address=None):
+    """Return a service client if an address is given, else the in-process model"""
+    if address:
+        client = GLiNERClient(address)
+        print(f"Connected to GLiNER service at {client.address[0]}:{client.address[1]}")
+        return client
+    return get_gliner_model()
+
+# ============================================================================
+# SECTION 5: MAIN EXECUTION
+# ============================================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a long-lived GLiNER extraction worker")
+    parser.add_argument("--host", default=DEFAULT_ADDRESS[0], help="Loopback host to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_ADDRESS[1])
+    parser.add_argument("--model", default=GLINER_MODEL)
+    parser.add_argument("--key-file", default=AUTHKEY_PATH,
+                        help="Where to write the key clients authenticate with (GLINER_SERVICE_KEY_FILE)")
+    args = parser.parse_args()
+
+    serve((args.host, args.port), args.model, args.key_file)
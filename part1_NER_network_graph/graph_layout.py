@@ -0,0 +1,265 @@
+"""
+SCALABLE GRAPH LAYOUT
+=====================
+Force-directed layout for graphs too big for nx.spring_layout, which compares
+every pair of nodes on every iteration.
+
+The forces are networkx's Fruchterman-Reingold ones. Repulsion is computed
+Barnes-Hut style on a quadtree built with NumPy: nodes in neighbouring cells
+of the finest grid repel each other exactly, and every farther node is felt
+through the centre of mass of the largest cell that is still well separated
+(the cell interaction lists of the fast multipole method). An iteration costs
+O(n log n + edges).
+
+Layouts are cached on disk keyed by the node set. An unchanged graph reuses its
+layout and a changed one warm-starts from the last cached layout, so it needs
+only a few iterations. Graphs above HUGE_GRAPH_NODES get a barycentric layout
+in O(edges) per pass instead.
+"""
+
+import os
+import glob
+import hashlib
+import numpy as np
+
+# Above this many nodes, skip the force simulation
+HUGE_GRAPH_NODES = 50_000
+
+# Layouts kept in a cache directory (most recently written first)
+CACHE_LAYOUTS = 8
+
+# ============================================================================
+# SECTION 1: FORCES
+# ============================================================================
+
+def _cell_lookup(cells, ids):
+    """Index of each id in the sorted array of occupied cells, or -1 where it is empty"""
+    found = np.minimum(np.searchsorted(cells, ids), len(cells) - 1)
+    return np.where(cells[found] == ids, found, -1)
+
+def _repulsion(pos, k, leaf_size=4, max_depth=20):
+    """Repulsive displacement k^2 / distance on every node, approximated by a quadtree
+
+    The tree is refined until the fullest finest cell holds at most
+    4 * leaf_size nodes, so dense clusters do not make the exact near field
+    quadratic. Only occupied cells are stored.
+    """
+    n = len(pos)
+    displacement = np.zeros_like(pos)
+    if n < 2:
+        return displacement
+
+    lo = pos.min(axis=0)
+    size = max(float((pos.max(axis=0) - lo).max()), 1e-9) * (1 + 1e-9)
+    depth = int(max(1, np.ceil(np.log(n / leaf_size) / np.log(4))))
+    while True:
+        grid = 1 << depth
+        cells = np.minimum(((pos - lo) / size * grid).astype(np.int64), grid - 1)
+        _, occupancy = np.unique(cells[:, 0] * grid + cells[:, 1], return_counts=True)
+        if occupancy.max() <= 4 * leaf_size or depth >= max_depth:
+            break
+        depth += 1
+
+    # Far field: cells that are children of the parent's neighbours but not neighbours themselves
+    offset_x, offset_y = (axis.ravel() for axis in np.meshgrid(np.arange(6), np.arange(6), indexing='ij'))
+    for level in range(2, depth + 1):
+        level_grid = 1 << level
+        cx, cy = (cells >> (depth - level)).T
+        occupied, cell_index = np.unique(cx * level_grid + cy, return_inverse=True)
+        mass = np.bincount(cell_index).astype(float)
+        com_x = np.bincount(cell_index, weights=pos[:, 0]) / mass
+        com_y = np.bincount(cell_index, weights=pos[:, 1]) / mass
+
+        other_x = ((cx >> 1) * 2 - 2)[:, None] + offset_x
+        other_y = ((cy >> 1) * 2 - 2)[:, None] + offset_y
+        far = (
+            (other_x >= 0) & (other_x < level_grid) & (other_y >= 0) & (other_y < level_grid)
+            & ((np.abs(other_x - cx[:, None]) > 1) | (np.abs(other_y - cy[:, None]) > 1))
+        )
+        rows, slots = np.nonzero(far)
+        other = _cell_lookup(occupied, other_x[rows, slots] * level_grid + other_y[rows, slots])
+        rows, other = rows[other >= 0], other[other >= 0]
+        delta_x = pos[rows, 0] - com_x[other]
+        delta_y = pos[rows, 1] - com_y[other]
+        scale = mass[other] * k * k / np.maximum(delta_x * delta_x + delta_y * delta_y, 1e-4)
+        displacement[:, 0] += np.bincount(rows, weights=delta_x * scale, minlength=n)
+        displacement[:, 1] += np.bincount(rows, weights=delta_y * scale, minlength=n)
+
+    # Near field: every node in the 3x3 block of finest cells around each node, exactly
+    cx, cy = cells.T
+    occupied, cell_index, counts = np.unique(cx * grid + cy, return_inverse=True, return_counts=True)
+    order = np.argsort(cell_index, kind='stable')
+    starts = np.cumsum(counts) - counts
+    nodes = np.arange(n)
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            tx, ty = cx + dx, cy + dy
+            inside = (tx >= 0) & (tx < grid) & (ty >= 0) & (ty < grid)
+            target = np.where(inside, _cell_lookup(occupied, tx * grid + ty), -1)
+            n_pairs = np.where(target >= 0, counts[target], 0)
+            i = np.repeat(nodes, n_pairs)
+            within = np.arange(len(i)) - np.repeat(np.cumsum(n_pairs) - n_pairs, n_pairs)
+            j = order[np.repeat(starts[target], n_pairs) + within]
+            i, j = i[i != j], j[i != j]
+            delta = pos[i] - pos[j]
+            distance2 = np.maximum((delta ** 2).sum(axis=1), 1e-4)
+            for axis in range(2):
+                displacement[:, axis] += np.bincount(i, weights=delta[:, axis] * k * k / distance2, minlength=n)
+    return displacement
+
+def _attraction(pos, src, dst, k):
+    """Attractive displacement distance^2 / k along every edge, on both ends"""
+    displacement = np.zeros_like(pos)
+    delta = pos[src] - pos[dst]
+    distance = np.maximum(np.sqrt((delta ** 2).sum(axis=1)), 0.01)
+    force = delta * (distance / k)[:, None]
+    for axis in range(2):
+        displacement[:, axis] -= np.bincount(src, weights=force[:, axis], minlength=len(pos))
+        displacement[:, axis] += np.bincount(dst, weights=force[:, axis], minlength=len(pos))
+    return displacement
+
+# ============================================================================
+# SECTION 2: LAYOUTS
+# ============================================================================
+
+def force_layout(n, src, dst, pos=None, k=None, iterations=50, temperature=0.1, threshold=1e-4, seed=42,
+                 gravity=10.0):
+    """Fruchterman-Reingold layout of n nodes with edges src[i] -> dst[i]
+
+    Starts from pos (n x 2) if given, else uniformly at random in the unit
+    square. temperature is the first step as a fraction of the layout's extent
+    and cools linearly to zero, as in nx.spring_layout. gravity pulls nodes
+    toward the centre (in proportion to their distance), so nodes without
+    edges do not drift off and squeeze the rest of the plot.
+    """
+    if pos is None:
+        pos = np.random.default_rng(seed).random((n, 2))
+    pos = np.array(pos, dtype=float)
+    if n < 2:
+        return pos
+    k = np.sqrt(1.0 / n) if k is None else k
+
+    t = max(float((pos.max(axis=0) - pos.min(axis=0)).max()), 1e-3) * temperature
+    dt = t / (iterations + 1)
+    for _ in range(iterations):
+        displacement = _repulsion(pos, k) + _attraction(pos, src, dst, k) - gravity * (pos - pos.mean(axis=0))
+        length = np.maximum(np.sqrt((displacement ** 2).sum(axis=1)), 0.01)
+        step = displacement * (t / length)[:, None]
+        pos += step
+        t -= dt
+        if np.linalg.norm(step) / n < threshold:
+            break
+    return pos
+
+def barycentric_layout(n, src, dst, passes=20, seed=42):
+    """Fast layout for huge graphs: random positions pulled toward their neighbours' mean"""
+    pos = np.random.default_rng(seed).random((n, 2))
+    degree = np.bincount(src, minlength=n) + np.bincount(dst, minlength=n)
+    connected = degree > 0
+    for _ in range(passes):
+        neighbour_sum = np.stack([
+            np.bincount(src, weights=pos[dst, axis], minlength=n) + np.bincount(dst, weights=pos[src, axis], minlength=n)
+            for axis in range(2)
+        ], axis=1)
+        pos[connected] = 0.5 * pos[connected] + 0.5 * neighbour_sum[connected] / degree[connected, None]
+    return pos
+
+def rescale(pos, scale=1.0):
+    """Center positions and scale them into [-scale, scale] (like nx.rescale_layout)"""
+    pos = pos - pos.mean(axis=0)
+    limit = np.abs(pos).max()
+    return pos * (scale / limit) if limit > 0 else pos
+
+def _warm_start(n, src, dst, known, seed=42):
+    """Initial positions from a cached layout (NaN rows are new nodes)
+
+    New nodes start at the mean of their placed neighbours, or at a random
+    point of the cached layout's bounding box if they have none.
+    """
+    placed = ~np.isnan(known[:, 0])
+    lo, hi = known[placed].min(axis=0), known[placed].max(axis=0)
+    rng = np.random.default_rng(seed)
+    pos = np.where(placed[:, None], known, lo + rng.random((n, 2)) * (hi - lo))
+
+    ends, others = np.concatenate([src, dst]), np.concatenate([dst, src])
+    from_placed = placed[others] & ~placed[ends]
+    count = np.bincount(ends[from_placed], minlength=n)
+    has_placed = count > 0
+    for axis in range(2):
+        total = np.bincount(ends[from_placed], weights=pos[others[from_placed], axis], minlength=n)
+        pos[has_placed, axis] = total[has_placed] / count[has_placed]
+    # Jitter so new nodes sharing a neighbour do not start on the same point
+    pos[~placed] += rng.normal(scale=1e-3, size=(int((~placed).sum()), 2))
+    return pos
+
+# ============================================================================
+# SECTION 3: LAYOUT CACHE
+# ============================================================================
+
+def layout_key(nodes):
+    """Cache key of a node set (independent of node order)"""
+    return hashlib.sha1("\n".join(sorted(map(str, nodes))).encode("utf-8")).hexdigest()
+
+def load_cached_layout(cache_dir, nodes):
+    """Return (positions, exact): the cached layout of this node set (exact=True), or
+    the most recent cached layout mapped onto these nodes with NaN for unknown
+    ones (exact=False), or (None, False) if the cache is empty
+    """
+    path = os.path.join(cache_dir, f"{layout_key(nodes)}.npz")
+    exact = os.path.exists(path)
+    if not exact:
+        cached = sorted(glob.glob(os.path.join(cache_dir, "*.npz")), key=os.path.getmtime, reverse=True)
+        if not cached:
+            return None, False
+        path = cached[0]
+
+    with np.load(path, allow_pickle=False) as saved:
+        cached_pos = dict(zip(saved["nodes"].tolist(), saved["pos"]))
+    pos = np.array([cached_pos.get(str(node), (np.nan, np.nan)) for node in nodes], dtype=float)
+    return pos, exact
+
+def save_cached_layout(cache_dir, nodes, pos):
+    """Cache a layout (before rescaling) under its node set, keeping the newest CACHE_LAYOUTS"""
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"{layout_key(nodes)}.npz")
+    tmp_path = f"{path}.tmp.npz"
+    np.savez_compressed(tmp_path, nodes=np.array([str(node) for node in nodes]), pos=pos)
+    os.replace(tmp_path, path)
+
+    cached = sorted(glob.glob(os.path.join(cache_dir, "*.npz")), key=os.path.getmtime, reverse=True)
+    for old_path in cached[CACHE_LAYOUTS:]:
+        os.remove(old_path)
+
+# ============================================================================
+# SECTION 4: NETWORKX ENTRY POINT
+# ============================================================================
+
+def scalable_layout(G, k=None, iterations=50, seed=42, cache_dir=None):
+    """Position the nodes of a networkx graph; returns {node: array([x, y])} in [-1, 1]
+
+    Edge direction is ignored. With cache_dir set, the layout of the same node
+    set is reused and other node sets warm-start from the last cached layout.
+    """
+    nodes = list(G)
+    n = len(nodes)
+    if n == 0:
+        return {}
+    index = {node: i for i, node in enumerate(nodes)}
+    edges = np.array([(index[u], index[v]) for u, v in G.edges() if u != v], dtype=np.int64).reshape(-1, 2)
+    src, dst = edges[:, 0], edges[:, 1]
+
+    cached, exact = load_cached_layout(cache_dir, nodes) if cache_dir else (None, False)
+    if exact:
+        pos = cached
+    elif n > HUGE_GRAPH_NODES:
+        pos = barycentric_layout(n, src, dst, seed=seed)
+    elif cached is not None and not np.isnan(cached[:, 0]).all():
+        # Most nodes are already in place: a short, cool run settles the new ones
+        pos = force_layout(n, src, dst, _warm_start(n, src, dst, cached, seed), k,
+                           iterations=max(10, iterations // 4), temperature=0.02, seed=seed)
+    else:
+        pos = force_layout(n, src, dst, k=k, iterations=iterations, seed=seed)
+
+    if cache_dir and not exact:
+        save_cached_layout(cache_dir, nodes, pos)
+    return dict(zip(nodes, rescale(pos)))
@@ -1,141 +1,186 @@
-﻿import json
 import networkx as nx
 import matplotlib.pyplot as plt
 import pandas as pd
+import numpy as np
 import os
 import random
-from collections import Counter, defaultdict
+from collections import Counter
+from entity_merger import load_results
+from graph_layout import scalable_layout
+from compact_graph import CompactGraph, NODE_TYPES, NODE_TYPE_CODES, RELATION_CODES, NO_COUNT, export_graph
+
+# (section, lowercased category) -> (node type, edge relation from the professor)
+EDGE_TYPES = {
+    ("academic_experience", "course"): ("course", "teaches"),
+    ("academic_experience", "program"): ("program", "teaches_in_program"),
+    ("academic_experience", "organization"): ("university", "teaches_at"),
+    ("academic_background", "organization"): ("university", "studied_at"),
+    ("academic_background", "education"): ("degree", "has_degree"),
+    ("academic_background", "period"): ("year", "graduated_in"),
+    ("academic_background", "location"): ("location", "studied_in"),
+    ("corporate_experience", "organization"): ("company", "worked_at"),
+    ("corporate_experience", "location"): ("location", "worked_in"),
+}
+SECTIONS = ("academic_experience", "academic_background", "corporate_experience")
+
+# Largest graph laid out with nx.spring_layout when layout="auto"
+SPRING_LAYOUT_MAX_NODES = 500
+
+def professor_node(prof):
+    return "Prof_" + str(prof.get("alias", f"ID_{prof.get('id', 'Unknown')}"))
+
+def collect_edges(data):
+    """
+    Flatten merged results into a flat edge table, in one pass.
+    Returns (edge_starts, entity_ids, relations, entities): professor i's edges
+    are rows edge_starts[i]:edge_starts[i + 1]; each row holds an index into
+    entities, the distinct (node type, stripped value) pairs in first-seen order,
+    and a compact_graph.RELATIONS code.
+    Categories missing from EDGE_TYPES and empty values are skipped.
+    """
+    entity_index = {}
+    edge_starts, entity_ids, relations = [0], [], []
+    for prof in data:
+        for section in SECTIONS:
+            for category, items in prof.get(section, {}).items():
+                edge_type = EDGE_TYPES.get((section, category.lower()))
+                if edge_type is None:
+                    continue
+                node_type, relation = edge_type[0], RELATION_CODES[edge_type[1]]
+                for val in items:
+                    val = val.strip()
+                    if val:
+                        entity_ids.append(entity_index.setdefault((node_type, val), len(entity_index)))
+                        relations.append(relation)
+        edge_starts.append(len(entity_ids))
+    return (np.asarray(edge_starts, dtype=np.int64), np.asarray(entity_ids, dtype=np.int64),
+            np.asarray(relations, dtype=np.uint8), list(entity_index))
+
+def _first_and_last(keys):
+    """(distinct keys, index of each one's first occurrence, index of its last one)"""
+    distinct, first = np.unique(keys, return_index=True)
+    _, last_reversed = np.unique(keys[::-1], return_index=True)
+    return distinct, first, len(keys) - 1 - last_reversed
+
+def sampled_compact_graph(prof_names, edge_starts, sampled_ids, entity_ids, relations,
+                          entity_names, entity_types, global_counts):
+    """
+    Build the CompactGraph of the sampled professors from the edge table.
+    prof_names are the node names of sampled_ids; entity_names and
+    entity_types give each entity's (aggregated) node name and type code.
+    Like networkx, nodes and edges keep their first position and last
+    attributes, so to_networkx() gives the graph built edge by edge.
+    """
+    # Intern node names; professors and entities share one namespace, as in networkx
+    name_ids = {}
+    entity_name_ids = np.array([name_ids.setdefault(name, len(name_ids)) for name in entity_names], dtype=np.int64)
+    prof_name_ids = np.array([name_ids.setdefault(name, len(name_ids)) for name in prof_names], dtype=np.int64)
+    names = list(name_ids)
+
+    # Rows of the sampled professors, in sample order
+    sampled_ids = np.asarray(sampled_ids, dtype=np.int64)
+    starts = edge_starts[sampled_ids]
+    lengths = edge_starts[sampled_ids + 1] - starts
+    offsets = np.cumsum(lengths) - lengths
+    rows = np.repeat(starts - offsets, lengths) + np.arange(lengths.sum())
+    row_entities = entity_ids[rows]
+
+    # Node appearance sequence: each professor, then the entities of its edges
+    prof_positions = offsets + np.arange(len(sampled_ids))
+    row_positions = np.arange(len(rows)) + np.repeat(np.arange(1, len(sampled_ids) + 1), lengths)
+    sequence = np.empty(len(rows) + len(sampled_ids), dtype=np.int64)
+    sequence_types = np.empty(len(sequence), dtype=np.uint8)
+    sequence[prof_positions] = prof_name_ids
+    sequence_types[prof_positions] = NODE_TYPE_CODES["professor"]
+    sequence[row_positions] = entity_name_ids[row_entities]
+    sequence_types[row_positions] = entity_types[row_entities]
+
+    distinct, first, last = _first_and_last(sequence)
+    node_order = np.argsort(first, kind='stable')
+    node_of_name = np.full(len(names), -1, dtype=np.int64)
+    node_of_name[distinct[node_order]] = np.arange(len(distinct))
+    node_types = np.empty(len(distinct), dtype=np.uint8)
+    node_types[node_of_name[distinct]] = sequence_types[last]
+    node_names = [names[name_id] for name_id in distinct[node_order].tolist()]
+
+    # Edges: a repeated (professor, entity) pair keeps its first position and last relation
+    src = node_of_name[np.repeat(prof_name_ids, lengths)]
+    dst = node_of_name[entity_name_ids[row_entities]]
+    _, first, last = _first_and_last(src * len(distinct) + dst)
+    edge_order = np.argsort(first, kind='stable')
+
+    professor = NODE_TYPE_CODES["professor"]
+    node_counts = [
+        NO_COUNT if code == professor else global_counts[(NODE_TYPES[code], name)]
+        for name, code in zip(node_names, node_types.tolist())
+    ]
+    return CompactGraph(node_names, node_types, src[first[edge_order]], dst[first[edge_order]],
+                        relations[rows][last[edge_order]], node_counts)
 
 def build_knowledge_graph(
     input_json,
     output_gexf="part1_NER_network_graph/results/professor_network.gexf",
     save_plot=True,
     threshold_ratio=0.15,
-    teacher_sample_ratio=0.01  # <== NEW PARAMETER
+    teacher_sample_ratio=0.01,  # <== NEW PARAMETER
+    layout="auto",
+    layout_cache_dir=None,
+    graph_backend="networkx",
+    graph_formats=("gexf",)
 ):
     """
     Build a knowledge graph from merged entity results.
     Aggregates entities with <10% of max frequency before building the graph,
     and includes only a sample (default 20%) of professors to reduce clutter.
+    input_json is a results file (.json, .jsonl or .parquet) or the merged
+    results list itself, which is left unmodified.
+    layout is "spring" (nx.spring_layout), "scalable" (graph_layout, cached in
+    layout_cache_dir if given) or "auto" (spring up to SPRING_LAYOUT_MAX_NODES).
+    graph_backend "networkx" returns an nx.DiGraph, "compact" a CompactGraph
+    (integer ids and NumPy edge arrays; converted to networkx only to plot).
+    graph_formats are the compact_graph.GRAPH_FORMATS to save; formats other
+    than "gexf" are written next to output_gexf with the same file stem.
     """
-    print(f"📘 Loading merged entity data from {input_json}...")
-    if not os.path.exists(input_json):
-        raise FileNotFoundError(f"Input file not found: {input_json}")
-
-    with open(input_json, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    if isinstance(input_json, (str, os.PathLike)):
+        print(f"📘 Loading merged entity data from {input_json}...")
+        if not os.path.exists(input_json):
+            raise FileNotFoundError(f"Input file not found: {input_json}")
+        data = load_results(os.fspath(input_json))
+    else:
+        print(f"📘 Using {len(input_json)} in-memory merged results...")
+        data = input_json
 
     # ------------------------------------------------------------------
-    # 🔹 STEP 1: Gather all entities by category (same as before)
+    # 🔹 STEP 1: Gather all entities into one edge table and count them
     # ------------------------------------------------------------------
     print("🔍 Collecting entity frequencies...")
-    entities_by_type = defaultdict(list)
+    edge_starts, entity_ids, relations, entities = collect_edges(data)
+    entity_counts = np.bincount(entity_ids, minlength=len(entities))
 
-    for prof in data:
-        # Academic Experience
-        for category, items in prof.get("academic_experience", {}).items():
-            for val in items:
-                val = val.strip()
-                if val:
-                    if category.lower() == "course":
-                        entities_by_type["course"].append(val)
-                    elif category.lower() == "program":
-                        entities_by_type["program"].append(val)
-                    elif category.lower() == "organization":
-                        entities_by_type["university"].append(val)
-
-        # Academic Background
-        for category, items in prof.get("academic_background", {}).items():
-            for val in items:
-                val = val.strip()
-                if val:
-                    if category.lower() == "organization":
-                        entities_by_type["university"].append(val)
-                    elif category.lower() == "education":
-                        entities_by_type["degree"].append(val)
-                    elif category.lower() == "period":
-                        entities_by_type["year"].append(val)
-                    elif category.lower() == "location":
-                        entities_by_type["location"].append(val)
-
-        # Corporate Experience
-        for category, items in prof.get("corporate_experience", {}).items():
-            for val in items:
-                val = val.strip()
-                if val:
-                    if category.lower() == "organization":
-                        entities_by_type["company"].append(val)
-                    elif category.lower() == "location":
-                        entities_by_type["location"].append(val)
-
-    freq_tables = {etype: Counter(vals) for etype, vals in entities_by_type.items()}
-    thresholds = {
-        etype: (max(cnt.values()) * threshold_ratio if cnt else 0)
-        for etype, cnt in freq_tables.items()
-    }
+    max_counts = {}
+    for (etype, _), count in zip(entities, entity_counts.tolist()):
+        max_counts[etype] = max(max_counts.get(etype, 0), count)
+    thresholds = {etype: max_count * threshold_ratio for etype, max_count in max_counts.items()}
 
     print("📊 Frequency thresholds (min counts to keep):")
     for etype, thr in thresholds.items():
         print(f"  {etype:<10}: {thr:.2f}")
 
     # ------------------------------------------------------------------
-    # 🔹 STEP 2: Replace rare entities (same as before)
+    # 🔹 STEP 2: Replace rare entities (per distinct entity, not in the input)
     # ------------------------------------------------------------------
     print("🧹 Aggregating low-frequency entities before graph construction...")
 
-    def aggregate_entity(entity, etype):
-        if freq_tables[etype][entity] < thresholds[etype]:
-            return f"Other_{etype.capitalize()}"
-        return entity
+    rare = entity_counts < np.array([thresholds[etype] for etype, _ in entities], dtype=float)
+    node_names = [
+        f"Other_{etype.capitalize()}" if is_rare else value
+        for (etype, value), is_rare in zip(entities, rare.tolist())
+    ]
 
-    for prof in data:
-        # Academic Experience
-        for category, items in prof.get("academic_experience", {}).items():
-            new_list = []
-            for val in items:
-                val = val.strip()
-                if not val:
-                    continue
-                if category.lower() == "course":
-                    val = aggregate_entity(val, "course")
-                elif category.lower() == "program":
-                    val = aggregate_entity(val, "program")
-                elif category.lower() == "organization":
-                    val = aggregate_entity(val, "university")
-                new_list.append(val)
-            prof["academic_experience"][category] = new_list
-
-        # Academic Background
-        for category, items in prof.get("academic_background", {}).items():
-            new_list = []
-            for val in items:
-                val = val.strip()
-                if not val:
-                    continue
-                if category.lower() == "organization":
-                    val = aggregate_entity(val, "university")
-                elif category.lower() == "education":
-                    val = aggregate_entity(val, "degree")
-                elif category.lower() == "period":
-                    val = aggregate_entity(val, "year")
-                elif category.lower() == "location":
-                    val = aggregate_entity(val, "location")
-                new_list.append(val)
-            prof["academic_background"][category] = new_list
-
-        # Corporate Experience
-        for category, items in prof.get("corporate_experience", {}).items():
-            new_list = []
-            for val in items:
-                val = val.strip()
-                if not val:
-                    continue
-                if category.lower() == "organization":
-                    val = aggregate_entity(val, "company")
-                elif category.lower() == "location":
-                    val = aggregate_entity(val, "location")
-                new_list.append(val)
-            prof["corporate_experience"][category] = new_list
+    # (node type, node name) -> mentions in the full dataset; Other_* sums what it replaced
+    global_counts = Counter()
+    for (etype, _), name, count in zip(entities, node_names, entity_counts.tolist()):
+        global_counts[(etype, name)] += count
 
     print("✅ Entities aggregated. Proceeding to graph construction...")
 
@@ -144,62 +189,19 @@ def build_knowledge_graph(
     # ------------------------------------------------------------------
     total_profs = len(data)
     sample_size = max(1, int(total_profs * teacher_sample_ratio))
-    sampled_data = random.sample(data, sample_size)
+    # Sampling indices picks the same professors as sampling data itself
+    sampled_ids = random.sample(range(total_profs), sample_size)
     print(f"🎯 Using {sample_size} professors out of {total_profs} ({teacher_sample_ratio*100:.0f}%) for the graph.")
 
     # ------------------------------------------------------------------
-    # 🔹 STEP 4: Build Graph (same as before, but with sampled_data)
+    # 🔹 STEP 4: Build Graph (same as before, from the sampled edge rows)
     # ------------------------------------------------------------------
-    G = nx.DiGraph()
-
-    for prof in sampled_data:
-        prof_node = f"Prof_{prof.get('alias', f'ID_{prof.get('id', 'Unknown')}')}"
-        G.add_node(prof_node, type="professor")
-
-        # Academic Experience
-        for category, items in prof.get("academic_experience", {}).items():
-            for value in items:
-                if not value:
-                    continue
-                if category.lower() == "course":
-                    G.add_node(value, type="course")
-                    G.add_edge(prof_node, value, relation="teaches")
-                elif category.lower() == "program":
-                    G.add_node(value, type="program")
-                    G.add_edge(prof_node, value, relation="teaches_in_program")
-                elif category.lower() == "organization":
-                    G.add_node(value, type="university")
-                    G.add_edge(prof_node, value, relation="teaches_at")
-
-        # Academic Background
-        for category, items in prof.get("academic_background", {}).items():
-            for value in items:
-                if not value:
-                    continue
-                if category.lower() == "organization":
-                    G.add_node(value, type="university")
-                    G.add_edge(prof_node, value, relation="studied_at")
-                elif category.lower() == "education":
-                    G.add_node(value, type="degree")
-                    G.add_edge(prof_node, value, relation="has_degree")
-                elif category.lower() == "period":
-                    G.add_node(value, type="year")
-                    G.add_edge(prof_node, value, relation="graduated_in")
-                elif category.lower() == "location":
-                    G.add_node(value, type="location")
-                    G.add_edge(prof_node, value, relation="studied_in")
-
-        # Corporate Experience
-        for category, items in prof.get("corporate_experience", {}).items():
-            for value in items:
-                if not value:
-                    continue
-                if category.lower() == "organization":
-                    G.add_node(value, type="company")
-                    G.add_edge(prof_node, value, relation="worked_at")
-                elif category.lower() == "location":
-                    G.add_node(value, type="location")
-                    G.add_edge(prof_node, value, relation="worked_in")
+    entity_types = np.array([NODE_TYPE_CODES[etype] for etype, _ in entities], dtype=np.uint8)
+    compact = sampled_compact_graph(
+        [professor_node(data[i]) for i in sampled_ids], edge_starts, sampled_ids,
+        entity_ids, relations, node_names, entity_types, global_counts
+    )
+    G = compact if graph_backend == "compact" else compact.to_networkx()
 
     print(f"✅ Graph built (sampled 20% professors): {G.number_of_nodes()} nodes, {G.number_of_edges()} edges")
 
@@ -207,14 +209,27 @@ def build_knowledge_graph(
     # 🔹 STEP 5: Save & Visualize (Enhanced)
     # ------------------------------------------------------------------
     os.makedirs(os.path.dirname(output_gexf), exist_ok=True)
-    nx.write_gexf(G, output_gexf)
-    print(f"💾 Graph saved to: {output_gexf}")
+    if "gexf" in graph_formats:
+        if graph_backend == "compact":
+            compact.write_gexf(output_gexf)
+        else:
+            nx.write_gexf(G, output_gexf)
+        print(f"💾 Graph saved to: {output_gexf}")
+    other_formats = [fmt for fmt in graph_formats if fmt != "gexf"]
+    for path in export_graph(compact, os.path.splitext(output_gexf)[0], other_formats):
+        print(f"💾 Graph saved to: {path}")
 
     if save_plot:
         try:
             print("🎨 Generating enhanced visualization...")
+            if graph_backend == "compact":
+                G = compact.to_networkx()
             plt.figure(figsize=(12, 12))
-            pos = nx.spring_layout(G, k=0.6, seed=42)
+            large_graph = layout == "scalable" or (layout == "auto" and G.number_of_nodes() > SPRING_LAYOUT_MAX_NODES)
+            if large_graph:
+                pos = scalable_layout(G, seed=42, cache_dir=layout_cache_dir)
+            else:
+                pos = nx.spring_layout(G, k=0.6, seed=42)
 
             # Define colors for node types
             color_map = {
@@ -248,15 +263,11 @@ def build_knowledge_graph(
             for n in G.nodes:
                 n_type = G.nodes[n]["type"]
                 if n_type == "professor":
-                    labels[n] = n.replace("Prof_", "")  # just the name
+                    if not large_graph:  # too many names to read on a large graph
+                        labels[n] = n.replace("Prof_", "")  # just the name
                 else:
                     # Show global frequency (from full dataset)
-                    global_count = 0
-                    for fdict in freq_tables.values():
-                        if n in fdict:
-                            global_count = fdict[n]
-                            break
-                    labels[n] = f"{n} ({global_count})"
+                    labels[n] = f"{n} ({G.nodes[n]['count']})"
 
             # Draw labels (small font, slight offset)
             nx.draw_networkx_labels(
@@ -285,4 +296,4 @@ def build_knowledge_graph(
             print(f"⚠️ Visualization skipped: {e}")
 
 
-    return G
+    return compact if graph_backend == "compact" else G
@@ -0,0 +1,84 @@
+"""
+BOUNDED LINE DEDUPLICATION STATE
+================================
+Fixed-memory "seen" sets for cross-document line deduplication.
+Both structures support `key in seen` and `seen.add(key)` like a set.
+"""
+
+import math
+import hashlib
+from collections import OrderedDict
+
+# ============================================================================
+# SECTION 1: LRU SET
+# ============================================================================
+
+class LRUSet:
+    """Set that keeps only the max_size most recently seen keys"""
+
+    def __init__(self, max_size=100_000):
+        self.max_size = max_size
+        self._keys = OrderedDict()
+
+    def __contains__(self, key):
+        if key in self._keys:
+            self._keys.move_to_end(key)
+            return True
+        return False
+
+    def add(self, key):
+        self._keys[key] = None
+        self._keys.move_to_end(key)
+        if len(self._keys) > self.max_size:
+            self._keys.popitem(last=False)
+
+    def __len__(self):
+        return len(self._keys)
+
+# ============================================================================
+# SECTION 2: BLOOM FILTER
+# ============================================================================
+
+class BloomFilter:
+    """Rotating Bloom filter remembering the last capacity to 2 * capacity keys
+
+    Keys go into the current generation; once it holds capacity keys it
+    replaces the previous generation and a fresh one starts, so older keys are
+    forgotten instead of filling the bits. Each generation is sized for
+    fp_rate / 2, which keeps the chance of reporting an unseen key as seen
+    below about fp_rate however many keys are added.
+    """
+
+    def __init__(self, capacity=100_000, fp_rate=0.01):
+        if not 0 < fp_rate < 1:
+            raise ValueError(f"fp_rate must be between 0 and 1, got {fp_rate}")
+        if capacity < 1:
+            raise ValueError(f"capacity must be positive, got {capacity}")
+        self.capacity = capacity
+        self.fp_rate = fp_rate
+        self.n_bits = max(8, int(-capacity * math.log(fp_rate / 2) / (math.log(2) ** 2)))
+        self.n_hashes = max(1, round(self.n_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.n_bits + 7) // 8)
+        self._previous_bits = bytearray(len(self._bits))
+        self._count = 0  # keys added to the current generation
+
+    def _positions(self, key):
+        # Double hashing: h1 + i * h2 gives n_hashes independent-enough positions
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.n_bits for i in range(self.n_hashes)]
+
+    def __contains__(self, key):
+        positions = self._positions(key)
+        return any(all(bits[p >> 3] & (1 << (p & 7)) for p in positions)
+                   for bits in (self._bits, self._previous_bits))
+
+    def add(self, key):
+        if self._count >= self.capacity:
+            self._previous_bits = self._bits
+            self._bits = bytearray(len(self._previous_bits))
+            self._count = 0
+        for p in self._positions(key):
+            self._bits[p >> 3] |= 1 << (p & 7)
+        self._count += 1
@@ -1,112 +1,309 @@
-import json
-from data_preprocessor import preprocess_dataset
-from gliner_extractor import extract_entities_gliner
+import argparse
+from data_preprocessor import preprocess_dataset, iter_preprocessed_batches
+from extractors import BACKENDS, ProcessExtractorPool, create_extractors, run_extractors
 from bert_extractor import HybridNERProcessor
-from entity_merger import load_results_from_files, merge_entity_results, save_merged_results
+from entity_merger import (RESULT_FORMATS, AsyncResultWriter, ResultFileWriter, RowMerger, SavedResults,
+                           iter_merged_results, results_path, save_merged_results)
+from pipeline_manifest import PipelineManifest, hash_rows, iter_changed_batches, patch_results
+from checkpoints import remove_checkpoints
+from entity_index import CanonicalEntityIndex
 from graphx import build_knowledge_graph
+from compact_graph import GRAPH_FORMATS
 
-def main():
-    """Main function to orchestrate the NER pipeline"""
+def iter_processed_batches(input_path, stream=False, batch_size=256, processed_csv_path=None, n_workers=1):
+    """
+    Yield preprocessed DataFrame batches
     
-    # ========================================================================
-    # SECTION 1: DATA PREPROCESSING
-    # ========================================================================
-    # Step 1: Preprocess raw dataset
-    print("Step 1: Preprocessing raw dataset...")
-    raw_csv_path = 'data/teachers_db_practice.csv'
-    processed_csv_path = 'data/teachers_db_practice_processed.csv'
+    In streaming mode the raw file is read and preprocessed batch_size rows at a
+    time; otherwise the whole dataset is yielded as a single batch. n_workers > 1
+    parses the HTML in a process pool (a batch is split between the workers).
+    """
+    if stream:
+        chunk_size = -(-batch_size // n_workers)
+        for batch_num, df_batch in enumerate(iter_preprocessed_batches(input_path, batch_size, n_workers, chunk_size)):
+            print(f"Batch {batch_num}: rows {df_batch.index[0]}-{df_batch.index[-1]}")
+            
+            if processed_csv_path:
+                df_batch.to_csv(processed_csv_path, mode='w' if batch_num == 0 else 'a',
+                                header=batch_num == 0, index=False)
+            yield df_batch
+    else:
+        df_processed = preprocess_dataset(input_path, n_workers=n_workers)
+        
+        if processed_csv_path:
+            df_processed.to_csv(processed_csv_path, index=False)
+        print(f"Dataset shape: {df_processed.shape}")
+        yield df_processed
+
+def iter_extracted_batches(batches, extractors, concurrent=True):
+    """Run every extraction backend over each batch, yielding {backend name: results}"""
+    for df_batch in batches:
+        yield run_extractors(extractors, df_batch, concurrent)
+
+def iter_summarized(results, samples=2):
+    """Yield results unchanged, then print their entity total and the first few rows"""
+    total_entities = 0
+    first_results = []
+    for result in results:
+        for section in ['academic_experience', 'academic_background', 'corporate_experience']:
+            for category in result[section]:
+                total_entities += len(result[section][category])
+        if len(first_results) < samples:
+            first_results.append(result)
+        yield result
+    
+    print(f"Total entities in merged results: {total_entities}")
+    
+    # Show sample merged results
+    print("\nSample merged results:")
+    for i, result in enumerate(first_results):
+        print(f"\nRow {i} - {result['alias']}:")
+        print(f"Academic Experience: {result['academic_experience']}")
+        print(f"Academic Background: {result['academic_background']}")
+        print(f"Corporate Experience: {result['corporate_experience']}")
+
+def print_summary(results):
+    for _ in iter_summarized(results):
+        pass
+
+def open_result_files(results_paths):
+    """ResultFileWriter per backend for results written as they are extracted (None if not spilling)"""
+    return {name: ResultFileWriter(path) for name, path in results_paths.items()} if results_paths else None
+
+def close_result_files(files):
+    """Close the writers of open_result_files and return their rows as SavedResults"""
+    for f in files.values():
+        f.close()
+        print(f"Saved {f.rows} rows to {f.path}")
+    return {name: SavedResults(f.path, f.rows) for name, f in files.items()}
+
+def extract_in_processes(batches, backends, backend_options=None, total_threads=None, checkpoint=None,
+                         merge_rows=True, results_paths=None, merged_path=None):
+    """Run each backend in its own process, merging rows as soon as all backends return them
+    
+    Returns ({backend name: results}, merged results), both ordered by row id.
+    With merge_rows=False rows are not merged and merged results are None.
+    
+    With results_paths ({backend name: file}) and merged_path, rows are written
+    to those files as they arrive instead of being collected, and SavedResults
+    reading them back are returned.
+    """
+    pool = ProcessExtractorPool(backends, backend_options, total_threads, checkpoint=checkpoint)
+    print(f"Running {len(backends)} backend processes with {pool.threads} threads each")
+    merger = RowMerger(backends)
+    extracted = {name: [] for name in backends}
+    merged_results = []
+    files = open_result_files(results_paths)
+    merged_file = ResultFileWriter(merged_path) if files and merge_rows else None
+    add_merged = merged_file.write if merged_file else merged_results.extend
+    
+    try:
+        for name, results in pool.run(batches):
+            if files:
+                # Each backend returns its rows in row id order
+                files[name].write(results)
+            else:
+                extracted[name].extend(results)
+            if merge_rows:
+                add_merged(merger.add(name, results))
+        add_merged(merger.flush())
+    finally:
+        pool.close()
+        for line in pool.stats:
+            print(line)
+        if files:
+            extracted = close_result_files(files)
+        if merged_file:
+            merged_results = close_result_files({"merged": merged_file})["merged"]
+    
+    if files:
+        return extracted, merged_results if merge_rows else None
+    for results in extracted.values():
+        results.sort(key=lambda r: r['id'])
+    merged_results.sort(key=lambda r: r['id'])
+    return extracted, merged_results if merge_rows else None
+
+def extract_in_threads(batches, backends, backend_options=None, concurrent=True, checkpoint=None,
+                       results_paths=None):
+    """Run the backends in this process; returns ({backend name: results}, None)
+    
+    With results_paths ({backend name: file}) each batch's results are written
+    to those files as they are extracted, and SavedResults are returned.
+    """
+    extractors = create_extractors(backends, backend_options, **(checkpoint or {}))
+    extracted = {name: [] for name in backends}
+    files = open_result_files(results_paths)
+    
+    try:
+        for batch_results in iter_extracted_batches(batches, extractors, concurrent):
+            for name, results in batch_results.items():
+                if files:
+                    files[name].write(results)
+                else:
+                    extracted[name].extend(results)
+    finally:
+        for extractor in extractors:
+            extractor.close()
+            print(extractor.stats())
+        if files:
+            extracted = close_result_files(files)
+    
+    return extracted, None
+
+def main(stream=False, input_path='data/teachers_db_practice.csv', batch_size=256, save_processed=True,
+         backends=("gliner", "bert_regex"), backend_options=None, concurrent=True,
+         processes=False, total_threads=None, results_format='jsonl', incremental=False,
+         manifest_path='results/pipeline_manifest.json', checkpoint_dir='results/checkpoints', resume=False,
+         entity_index_path=None, merge_processes=None, graph_sample_ratio=0.01,
+         layout_cache_dir='results/layout_cache', graph_backend='networkx',
+         graph_formats=('gexf',), preprocess_workers=1):
+    """Main function to orchestrate the NER pipeline
+    
+    backends are names from extractors.BACKENDS; backend_options maps a backend
+    name to its constructor kwargs. Backends run concurrently on each batch
+    unless concurrent=False. With processes=True each backend runs in its own
+    process with total_threads split between them, and rows are merged while
+    extraction is still running.
     
-    import pandas as pd
-    df_processed = preprocess_dataset(raw_csv_path)
+    Stages hand results to each other in memory. Result files are a side output
+    written in the background in results_format ('json', 'jsonl', 'parquet',
+    or None to skip them). When streaming, extracted rows are written to the
+    result files batch by batch instead, and merging reads them back from disk
+    (incrementally for 'jsonl' and 'parquet'); the graph step still loads every
+    merged row.
     
-    # Save preprocessed dataset
-    df_processed.to_csv(processed_csv_path, index=False)
-    print(f"Preprocessed dataset saved to {processed_csv_path}")
-    print(f"Dataset shape: {df_processed.shape}")
+    With incremental=True only rows whose alias or full_info changed since the
+    last run (per the manifest at manifest_path) are extracted and patched into
+    the saved results; the preprocessed CSV is not rewritten in that mode.
+    
+    preprocess_workers processes parse the HTML biographies into sections.
+    
+    Each extraction backend appends finished rows to a checkpoint in
+    checkpoint_dir (None disables this); resume=True continues an interrupted
+    run from those checkpoints. They are deleted once the results are saved.
+    
+    With entity_index_path set, merged entities are canonicalized across all
+    professors through a CanonicalEntityIndex saved at (and reused from) that path.
+    
+    merge_processes shards the merge step over that many processes (rows
+    merged during process-mode extraction are not affected).
+    
+    graph_sample_ratio is the share of professors drawn in the network graph;
+    large graphs use graph_layout with its layouts cached in layout_cache_dir.
+    graph_backend 'compact' builds the graph as a compact_graph.CompactGraph.
+    graph_formats are the compact_graph.GRAPH_FORMATS the graph is saved in.
+    """
+    
+    processed_csv_path = 'data/teachers_db_practice_processed.csv'
+    results_paths = {name: results_path(f'results/{name}_entities_results', results_format) for name in backends}
+    output_file = results_path('results/merged_entities_results', results_format)
+    writer = AsyncResultWriter() if results_format else None
+    checkpoint = {"checkpoint_dir": checkpoint_dir, "resume": resume, "run_id": input_path} if checkpoint_dir else None
     
     # ========================================================================
-    # SECTION 2: GLINER EXTRACTION
+    # SECTION 1: DATA PREPROCESSING
     # ========================================================================
-    # Step 2: Extract entities using GLiNER
-    print("\nStep 2: Extracting entities with GLiNER...")
-    gliner_results = extract_entities_gliner(df_processed)
-    
-    # Save GLiNER results
-    gliner_output_path = 'results/gliner_entities_results.json'
-    with open(gliner_output_path, 'w') as f:
-        json.dump(gliner_results, f, indent=2)
-    print(f"GLiNER results saved to {gliner_output_path}")
+    previous = None
+    if incremental:
+        if not results_format:
+            raise ValueError("Incremental runs patch the saved results, so results_format cannot be None")
+        
+        # Step 1: Find new or changed rows and preprocess only those
+        print(f"Step 1: Checking {input_path} for changed rows...")
+        manifest = PipelineManifest(manifest_path)
+        versions = {name: BACKENDS[name].version((backend_options or {}).get(name, {})) for name in backends}
+        hashes, positions = hash_rows(input_path, batch_size)
+        previous = manifest.previous_results(versions, results_paths, output_file)
+        changed, removed = manifest.diff(hashes) if previous else (set(hashes), set())
+        print(f"{len(changed)} new or changed rows, {len(removed)} removed rows")
+        batches = iter_changed_batches(input_path, {positions[key] for key in changed}, batch_size,
+                                       preprocess_workers)
+        save_processed = False
+    else:
+        # Step 1: Preprocess raw dataset (lazily, batch by batch when streaming)
+        mode = f"streaming in batches of {batch_size} rows" if stream else "full dataset"
+        print(f"Step 1: Preprocessing {input_path} ({mode})...")
+        batches = iter_processed_batches(input_path, stream, batch_size,
+                                         processed_csv_path if save_processed else None, preprocess_workers)
     
     # ========================================================================
-    # SECTION 3: BERT+REGEX EXTRACTION
+    # SECTIONS 2-3: ENTITY EXTRACTION (GLINER, BERT+REGEX, ...)
     # ========================================================================
-    # Step 3: Extract entities using BERT + Regex approach
-    print("\nStep 3: Extracting entities with BERT + Regex...")
-    processor = HybridNERProcessor()
-    bert_regex_results = []
+    print(f"\nSteps 2-3: Extracting entities with {', '.join(backends)}...")
     
-    for idx, row in df_processed.iterrows():
-        print(f"Processing Professor {idx+1}: {row.get('alias', 'Unknown')}")
-        
-        html_content = row.get('full_info', '')
-        prof_id = idx  # Use dataset index starting from 0
-        alias = row.get('alias', f'Professor_{idx}')
-        
-        if html_content:
-            result = processor.process_professor(html_content, prof_id, alias)
-            bert_regex_results.append(result)
+    # Streamed rows go straight to the result files instead of being collected
+    spill_paths = results_paths if stream and writer and not incremental else None
+    
+    if previous and not changed:
+        print("No new or changed rows, skipping extraction")
+        extracted, merged_results = {name: [] for name in backends}, None
+    elif processes:
+        # Canonical ids are assigned from all rows at once, so canonicalized rows are merged afterwards
+        extracted, merged_results = extract_in_processes(batches, backends, backend_options, total_threads,
+                                                         checkpoint, merge_rows=not entity_index_path,
+                                                         results_paths=spill_paths, merged_path=output_file)
+    else:
+        extracted, merged_results = extract_in_threads(batches, backends, backend_options, concurrent,
+                                                       checkpoint, spill_paths)
     
-    # Save BERT+Regex results
-    bert_regex_output_path = 'results/bert_regex_entities_results.json'
-    with open(bert_regex_output_path, 'w') as f:
-        json.dump(bert_regex_results, f, indent=2)
-    print(f"BERT+Regex results saved to {bert_regex_output_path}")
-    print(f"Completed NER extraction for {len(bert_regex_results)} rows")
+    if save_processed:
+        print(f"Preprocessed dataset saved to {processed_csv_path}")
     
     # ========================================================================
     # SECTION 4: ENTITY MERGING (ACTIVE)
     # ========================================================================
-    print("\nStep 4: Merging GLiNER and BERT+Regex results...")
-    
-    # File paths
-    gliner_file = 'results/gliner_entities_results.json'
-    bert_file = 'results/bert_regex_entities_results.json'
-    output_file = 'results/merged_entities_results.json'
+    print(f"\nStep 4: Merging {' + '.join(backends)} results...")
     
     try:
-        # Load results
-        print("Loading GLiNER and BERT+Regex results...")
-        gliner_results, bert_results = load_results_from_files(gliner_file, bert_file)
-        
-        print(f"GLiNER results: {len(gliner_results)} entries")
-        print(f"BERT+Regex results: {len(bert_results)} entries")
-        
-        # Merge results
-        print("Merging results...")
-        merged_results = merge_entity_results(gliner_results, bert_results)
-        
-        # Save merged results
-        print(f"Saving merged results to {output_file}...")
-        save_merged_results(merged_results, output_file)
-        
-    #    print(f"Successfully merged {len(merged_results)} entries")
-        
-        # Print summary statistics
-        total_entities = 0
-        for result in merged_results:
-            for section in ['academic_experience', 'academic_background', 'corporate_experience']:
-                for category in result[section]:
-                    total_entities += len(result[section][category])
+        if merged_results is None:
+            for name in backends:
+                print(f"{name} results: {len(extracted[name])} entries")
+            
+            entity_index = None
+            if entity_index_path:
+                # Register all entities up front so canonical ids do not depend on timing
+                entity_index = CanonicalEntityIndex.load(entity_index_path)
+                entity_index.add_results(*extracted.values())
+                print(f"Entity index: {len(entity_index)} canonical entities")
+                entity_index.save(entity_index_path)
+            
+            # Merge results (lazily: rows are merged as they are written)
+            print("Merging results...")
+            merged_results = iter_merged_results([extracted[name] for name in backends], entity_index,
+                                                 merge_processes)
+            if previous or not writer:
+                merged_results = list(merged_results)
+        else:
+            print(f"Rows were merged during extraction ({len(merged_results)} entries)")
         
-        print(f"Total entities in merged results: {total_entities}")
+        if previous:
+            # Patch the re-extracted rows into the results of the last run
+            print(f"Patching {len(merged_results)} rows into the previous results...")
+            extracted = {name: patch_results(previous[name], extracted[name], manifest.positions, positions)
+                         for name in backends}
+            merged_results = patch_results(previous["merged"], merged_results, manifest.positions, positions)
         
-        # Show sample merged results
-        print("\nSample merged results:")
-        for i in range(min(2, len(merged_results))):
-            print(f"\nRow {i} - {merged_results[i]['alias']}:")
-            print(f"Academic Experience: {merged_results[i]['academic_experience']}")
-            print(f"Academic Background: {merged_results[i]['academic_background']}")
-            print(f"Corporate Experience: {merged_results[i]['corporate_experience']}")
+        # Save per-backend results (in the background) and merged results
+        if writer:
+            for name, results in extracted.items():
+                if not isinstance(results, SavedResults):
+                    writer.save(results, results_paths[name])
+            if isinstance(merged_results, SavedResults):
+                # Written while extracting
+                print_summary(merged_results)
+                merged_results = None
+            elif isinstance(merged_results, list):
+                print(f"Saving merged results to {output_file}...")
+                writer.save(merged_results, output_file)
+                print_summary(merged_results)
+            else:
+                # Streamed to disk as they are merged; the graph reads them back from the file
+                print(f"Saving merged results to {output_file}...")
+                n_rows = save_merged_results(iter_summarized(merged_results), output_file)
+                print(f"Saved {n_rows} rows to {output_file}")
+                merged_results = None
+        else:
+            print_summary(merged_results)
         
     except Exception as e:
         print(f"Error during merging: {str(e)}")
@@ -118,14 +315,114 @@ def main():
     # Step 5: Generate social network graph from extracted entities
     print("\nStep 5: Generating network graph...")
 
-    merged_json_path = 'results/merged_entities_results.json'
     output_gexf = 'results/professor_network.gexf'
 
+    # Streamed merged results are read back from disk
+    graph_input = output_file if merged_results is None else merged_results
+
     try:
-        build_knowledge_graph(merged_json_path, output_gexf)
+        build_knowledge_graph(graph_input, output_gexf, teacher_sample_ratio=graph_sample_ratio,
+                              layout_cache_dir=layout_cache_dir, graph_backend=graph_backend,
+                              graph_formats=graph_formats)
         print("Knowledge graph successfully generated and saved.")
     except Exception as e:
         print(f"Error generating knowledge graph: {e}")
+    
+    if writer:
+        writer.close()
+    
+    if checkpoint_dir:
+        remove_checkpoints(checkpoint_dir, backends)
+    
+    if incremental:
+        # Only record the new state once the results it describes are on disk
+        manifest.update(hashes, positions, versions)
+        manifest.save()
+        print(f"Manifest saved to {manifest_path}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Run the NER + network graph pipeline")
+    parser.add_argument("--input", default="data/teachers_db_practice.csv",
+                        help="Raw dataset (.csv or .parquet)")
+    parser.add_argument("--stream", action="store_true",
+                        help="Read, preprocess and extract in row batches to keep memory flat")
+    parser.add_argument("--batch-size", type=int, default=256,
+                        help="Rows per batch in streaming mode")
+    parser.add_argument("--no-save-processed", action="store_true",
+                        help="Do not write the preprocessed CSV")
+    parser.add_argument("--preprocess-workers", type=int, default=1,
+                        help="Processes parsing the HTML biographies into sections")
+    parser.add_argument("--backends", nargs="+", default=["gliner", "bert_regex"], choices=list(BACKENDS),
+                        help="Extraction backends to run and merge")
+    parser.add_argument("--sequential", action="store_true",
+                        help="Run backends one after another instead of concurrently")
+    parser.add_argument("--results-format", default="jsonl", choices=RESULT_FORMATS + ("none",),
+                        help="Format of the per-backend and merged result files ('none' skips them)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only extract rows whose biography changed since the last run")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue an interrupted run from the extraction checkpoints")
+    parser.add_argument("--checkpoint-dir", default="results/checkpoints",
+                        help="Directory of the per-backend extraction checkpoints")
+    parser.add_argument("--entity-index", metavar="PATH",
+                        help="Canonicalize entities across professors with a persistent index (e.g. results/entity_index.json)")
+    parser.add_argument("--processes", action="store_true",
+                        help="Run each backend in its own process and merge rows as they complete")
+    parser.add_argument("--threads", type=int,
+                        help="CPU threads split between backend processes (default: all cores)")
+    parser.add_argument("--merge-processes", type=int,
+                        help="Merge results in row shards on this many processes")
+    parser.add_argument("--graph-sample-ratio", type=float, default=0.01,
+                        help="Share of professors drawn in the network graph (1.0 draws all of them)")
+    parser.add_argument("--graph-backend", default="networkx", choices=("networkx", "compact"),
+                        help="In-memory graph representation ('compact': integer ids and NumPy edge arrays)")
+    parser.add_argument("--graph-formats", nargs="+", default=["gexf"], choices=GRAPH_FORMATS,
+                        help="Files the network graph is saved as (parquet node/edge tables, CSR npz, graphml, TSV edge list)")
+    parser.add_argument("--gliner-batch-size", type=int, default=8,
+                        help="Texts per GLiNER forward pass")
+    parser.add_argument("--gliner-service", metavar="HOST:PORT",
+                        help="Use a running gliner_service.py worker instead of loading the model")
+    parser.add_argument("--bert-batch-size", type=int, default=16,
+                        help="Lines per BERT forward pass")
+    parser.add_argument("--regex-only", nargs="+", default=[], choices=HybridNERProcessor.REGEX_ONLY_TYPES,
+                        help="Line types extracted by regex alone, skipping BERT")
+    parser.add_argument("--ner-cache", metavar="PATH",
+                        help="SQLite file caching BERT spans per line across runs")
+    parser.add_argument("--bert-workers", type=int, default=1,
+                        help="Worker processes for the BERT + Regex stage")
+    parser.add_argument("--torch-threads", type=int,
+                        help="Torch threads per BERT worker (default: cores / workers)")
+    parser.add_argument("--line-dedup", default="document", choices=HybridNERProcessor.DEDUP_SCOPES,
+                        help="Scope of repeated-line skipping in BERT + Regex")
+    parser.add_argument("--dedup-max-lines", type=int, default=100_000,
+                        help="Lines remembered across biographies by --line-dedup lru/bloom")
+    parser.add_argument("--dedup-fp-rate", type=float, default=0.01,
+                        help="False-positive rate of the --line-dedup bloom filter")
+    args = parser.parse_args()
+    
+    backend_options = {
+        "gliner": {
+            "batch_size": args.gliner_batch_size,
+            "service": args.gliner_service
+        },
+        "bert_regex": {
+            "workers": args.bert_workers,
+            "torch_threads": args.torch_threads,
+            "batch_size": args.bert_batch_size,
+            "regex_only_types": args.regex_only,
+            "cache_path": args.ner_cache,
+            "dedup_scope": args.line_dedup,
+            "dedup_max_lines": args.dedup_max_lines,
+            "dedup_fp_rate": args.dedup_fp_rate
+        }
+    }
+    
+    main(stream=args.stream, input_path=args.input, batch_size=args.batch_size,
+         save_processed=not args.no_save_processed, backends=args.backends,
+         backend_options=backend_options, concurrent=not args.sequential,
+         processes=args.processes, total_threads=args.threads,
+         results_format=None if args.results_format == "none" else args.results_format,
+         incremental=args.incremental, checkpoint_dir=args.checkpoint_dir, resume=args.resume,
+         entity_index_path=args.entity_index, merge_processes=args.merge_processes,
+         graph_sample_ratio=args.graph_sample_ratio, graph_backend=args.graph_backend,
+         graph_formats=args.graph_formats, preprocess_workers=args.preprocess_workers)
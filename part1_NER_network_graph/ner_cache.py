@@ -0,0 +1,111 @@
+"""
+PERSISTENT NER SPAN CACHE
+=========================
+SQLite-backed cache of filtered BERT spans per line.
+Keys combine the model name, the score threshold and the line text, so
+re-runs and incremental runs only run inference on unseen lines.
+Size-bounded with least-recently-used eviction.
+The connection may be used from any thread (run_extractors runs each batch
+on a new one); a lock serializes access to it.
+"""
+
+import json
+import sqlite3
+import hashlib
+import itertools
+import threading
+import time
+
+# ============================================================================
+# SECTION 1: CACHE
+# ============================================================================
+
+class SpanCache:
+    def __init__(self, path, max_entries=200_000):
+        """Open (or create) the cache database
+
+        Args:
+            path: SQLite file path
+            max_entries: Maximum number of cached lines before LRU eviction
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS spans ("
+            " key TEXT PRIMARY KEY, spans TEXT NOT NULL, last_used INTEGER NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS spans_last_used ON spans(last_used)")
+        self.conn.commit()
+        # Monotonic usage stamps, seeded from the clock so they stay ordered across runs
+        self._clock = itertools.count(time.time_ns())
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(line, model_name, min_score):
+        """Build the cache key for a line under a given model and threshold"""
+        raw = f"{model_name}\x1f{min_score}\x1f{line}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def get_many(self, keys):
+        """Return {key: spans} for the keys present, marking them recently used"""
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        with self._lock:
+            for i in range(0, len(unique_keys), 500):
+                chunk = unique_keys[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self.conn.execute(
+                    f"SELECT key, spans FROM spans WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, spans in rows:
+                    found[key] = json.loads(spans)
+
+            if found:
+                self.conn.executemany(
+                    "UPDATE spans SET last_used = ? WHERE key = ?",
+                    [(next(self._clock), key) for key in found]
+                )
+                self.conn.commit()
+
+        self.hits += len(found)
+        self.misses += len(unique_keys) - len(found)
+        return found
+
+    def put_many(self, items):
+        """Store (key, spans) pairs and evict least recently used entries over the bound"""
+        rows = [(key, json.dumps(spans), next(self._clock)) for key, spans in items]
+        with self._lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO spans (key, spans, last_used) VALUES (?, ?, ?)", rows
+            )
+            excess = self.conn.execute("SELECT COUNT(*) FROM spans").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self.conn.execute(
+                    "DELETE FROM spans WHERE key IN "
+                    "(SELECT key FROM spans ORDER BY last_used ASC LIMIT ?)", (excess,)
+                )
+            self.conn.commit()
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+# ============================================================================
+# SECTION 2: SPAN SERIALIZATION
+# ============================================================================
+
+def to_cacheable(spans):
+    """Convert pipeline spans (numpy scores) to plain JSON-safe dicts"""
+    return [
+        {
+            "entity_group": s["entity_group"],
+            "word": s["word"],
+            "start": int(s["start"]),
+            "end": int(s["end"]),
+            "score": float(s["score"])
+        }
+        for s in spans
+    ]
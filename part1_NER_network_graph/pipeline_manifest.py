@@ -0,0 +1,154 @@
+"""
+INCREMENTAL PIPELINE MANIFEST
+=============================
+Records a content hash of every row's 'alias' and 'full_info' together with
+the version of each extraction backend that produced the saved results.
+Rows are keyed by the dataset's own 'id' and 'alias' columns rather than
+their position, so inserting or deleting a row does not shift the rest.
+On the next run only new or changed rows are re-extracted and patched into
+the saved per-backend and merged results; a backend version change (or a
+missing results file) falls back to a full run.
+"""
+
+import os
+import json
+import hashlib
+from collections import Counter
+import pandas as pd
+from data_preprocessor import iter_raw_batches, add_section_columns
+from entity_merger import load_results
+
+# ============================================================================
+# SECTION 1: ROW HASHING
+# ============================================================================
+
+def row_hash(html_content, alias=""):
+    """Content hash of one row's HTML biography and alias (the alias names its graph node)"""
+    text = html_content if isinstance(html_content, str) else ""
+    alias = alias if isinstance(alias, str) else ""
+    return hashlib.sha1(f"{alias}\0{text}".encode("utf-8")).hexdigest()
+
+def batch_hashes(batch):
+    """Return {row id: row_hash} for a DataFrame batch with 'full_info' (and 'alias') columns"""
+    aliases = batch['alias'] if 'alias' in batch.columns else [""] * len(batch)
+    return dict(zip(batch.index.tolist(), map(row_hash, batch['full_info'], aliases)))
+
+def row_key(dataset_id, alias):
+    """Stable key of a row from its dataset 'id' and 'alias' (either may be missing)"""
+    if isinstance(dataset_id, float) and dataset_id.is_integer():
+        dataset_id = int(dataset_id)
+    dataset_id = "" if pd.isna(dataset_id) else str(dataset_id)
+    alias = alias if isinstance(alias, str) else ""
+    return f"{dataset_id}\0{alias}"
+
+def hash_rows(input_path, batch_size=256):
+    """Return ({row key: hash of alias and full_info}, {row key: row id}) for the raw dataset
+
+    Repeated keys get an occurrence number so every row keeps its own key.
+    """
+    hashes, positions = {}, {}
+    seen = Counter()
+    for batch in iter_raw_batches(input_path, batch_size):
+        dataset_ids = batch['id'] if 'id' in batch.columns else [None] * len(batch)
+        aliases = batch['alias'] if 'alias' in batch.columns else [None] * len(batch)
+        for (row_id, h), dataset_id, alias in zip(batch_hashes(batch).items(), dataset_ids, aliases):
+            key = row_key(dataset_id, alias)
+            seen[key] += 1
+            if seen[key] > 1:
+                key = f"{key}\0{seen[key]}"
+            hashes[key] = h
+            positions[key] = row_id
+    return hashes, positions
+
+def iter_changed_batches(input_path, row_ids, batch_size=256, n_workers=1):
+    """Yield preprocessed batches holding only the given rows (parsed by n_workers processes)"""
+    for batch in iter_raw_batches(input_path, batch_size):
+        changed = batch[batch.index.isin(row_ids)]
+        if len(changed):
+            print(f"Changed rows {changed.index[0]}-{changed.index[-1]}: {len(changed)}")
+            yield add_section_columns(changed, n_workers=n_workers, chunk_size=-(-len(changed) // n_workers))
+
+# ============================================================================
+# SECTION 2: MANIFEST
+# ============================================================================
+
+class PipelineManifest:
+    def __init__(self, path):
+        """Load the manifest at path (an empty one if it does not exist yet)"""
+        self.path = path
+        self.versions = {}
+        self.rows = {}       # row key -> content hash
+        self.positions = {}  # row key -> row id in the saved results
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            # Manifests keyed by row position (no "positions") trigger a full run
+            if "positions" in manifest:
+                self.versions = manifest.get("versions", {})
+                self.rows = manifest.get("rows", {})
+                self.positions = manifest["positions"]
+
+    def previous_results(self, versions, results_paths, merged_path):
+        """Load the saved results if they were produced by the same backend versions
+
+        Returns {backend name: results, 'merged': merged results}, or None when
+        the saved results cannot be reused and every row must be extracted.
+        """
+        if not self.rows:
+            print("No manifest yet: extracting every row")
+            return None
+        if self.versions != versions:
+            print(f"Backend versions changed ({self.versions} -> {versions}): extracting every row")
+            return None
+        paths = {**results_paths, "merged": merged_path}
+        missing = [path for path in paths.values() if not os.path.exists(path)]
+        if missing:
+            print(f"Saved results missing ({', '.join(missing)}): extracting every row")
+            return None
+        return {name: load_results(path) for name, path in paths.items()}
+
+    def diff(self, hashes):
+        """Return (keys of new or changed rows, keys of rows no longer in the dataset)"""
+        changed = {key for key, h in hashes.items() if self.rows.get(key) != h}
+        removed = set(self.rows) - set(hashes)
+        return changed, removed
+
+    def update(self, hashes, positions, versions):
+        self.rows = dict(hashes)
+        self.positions = dict(positions)
+        self.versions = dict(versions)
+
+    def save(self):
+        """Write the manifest atomically (after the results it describes are saved)"""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "versions": self.versions,
+                "rows": self.rows,
+                "positions": self.positions
+            }, f)
+        os.replace(tmp_path, self.path)
+
+# ============================================================================
+# SECTION 3: PATCHING RESULTS
+# ============================================================================
+
+def patch_results(previous, updated, previous_positions, positions):
+    """Patch updated rows into previous results, mapping rows through their keys
+
+    Args:
+        previous: Results of the last run (ids are row positions at that time)
+        updated: Re-extracted rows (ids are current row positions)
+        previous_positions: {row key: row id} of the last run
+        positions: {row key: row id} of the current dataset
+    """
+    previous_keys = {row_id: key for key, row_id in previous_positions.items()}
+    by_id = {}
+    for result in previous:
+        key = previous_keys.get(result['id'])
+        if key in positions:
+            # Rows after an inserted or deleted row move to their new position
+            by_id[positions[key]] = {**result, 'id': positions[key]}
+    for result in updated:
+        by_id[result['id']] = result
+    return [by_id[row_id] for row_id in sorted(by_id)]
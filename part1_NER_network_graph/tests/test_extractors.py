@@ -0,0 +1,42 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("transformers")
+import bert_extractor
+from extractors import BertRegexExtractor, Extractor, empty_result, run_extractors
+
+BIOGRAPHY = "<p>Professor of Finance at IE Business School.</p><p>Worked at Acme Bank in Madrid.</p>"
+
+def fake_pipeline(*args, **kwargs):
+    def run(lines, batch_size=None):
+        return [[{"entity_group": "ORG", "word": "Acme Bank", "start": 0, "end": 9, "score": 0.99}]
+                for _ in lines]
+    return run
+
+class EmptyExtractor(Extractor):
+    name = "empty"
+
+    def _extract(self, df_batch):
+        return [empty_result(idx, row["alias"]) for idx, row in df_batch.iterrows()]
+
+def test_cached_bert_regex_runs_concurrently_over_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(bert_extractor, "pipeline", fake_pipeline)
+    cache_path = str(tmp_path / "ner.sqlite")
+    extractors = [BertRegexExtractor(cache_path=cache_path), EmptyExtractor()]
+
+    batches = [
+        pd.DataFrame({"alias": ["a", "b"], "full_info": [BIOGRAPHY, BIOGRAPHY]}, index=[0, 1]),
+        pd.DataFrame({"alias": ["c"], "full_info": [BIOGRAPHY]}, index=[2])
+    ]
+    try:
+        for df_batch in batches:
+            results = run_extractors(extractors, df_batch, concurrent=True)
+            assert [r["id"] for r in results["bert_regex"]] == df_batch.index.tolist()
+    finally:
+        for extractor in extractors:
+            extractor.close()
+
+    with sqlite3.connect(cache_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM spans").fetchone()[0] > 0
@@ -0,0 +1,38 @@
+import pandas as pd
+
+from extractors import empty_result
+from pipeline_manifest import PipelineManifest, hash_rows, patch_results
+
+ROWS = [
+    (101.0, "Ada", "<p>Professor of Finance.</p>"),
+    (102.0, "Ben", "<p>Professor of Law.</p>"),
+    (None, "Cy", "<p>Professor of Design.</p>"),
+    (104.0, "Di", "<p>Professor of Marketing.</p>"),
+]
+
+def write_dataset(path, rows):
+    pd.DataFrame(rows, columns=["id", "alias", "full_info"]).to_csv(path, index=False)
+
+def test_deleting_a_row_only_drops_that_row(tmp_path):
+    input_path = str(tmp_path / "dataset.csv")
+    manifest = PipelineManifest(str(tmp_path / "manifest.json"))
+
+    write_dataset(input_path, ROWS)
+    hashes, positions = hash_rows(input_path, batch_size=2)
+    manifest.update(hashes, positions, {})
+    manifest.save()
+    previous = [empty_result(row_id, alias) for row_id, (_, alias, _) in enumerate(ROWS)]
+
+    # Delete Ben and edit Di: only Di is extracted again
+    rows = [ROWS[0], ROWS[2], (104.0, "Di", "<p>Professor of Strategy.</p>")]
+    write_dataset(input_path, rows)
+    hashes, positions = hash_rows(input_path, batch_size=2)
+    manifest = PipelineManifest(str(tmp_path / "manifest.json"))
+    changed, removed = manifest.diff(hashes)
+    assert [positions[key] for key in changed] == [2]
+    assert len(removed) == 1
+
+    updated = [{**empty_result(2, "Di"), "edited": True}]
+    patched = patch_results(previous, updated, manifest.positions, positions)
+    assert [(result["id"], result["alias"]) for result in patched] == [(0, "Ada"), (1, "Cy"), (2, "Di")]
+    assert patched[2]["edited"]
@@ -0,0 +1,68 @@
+import os
+import re
+import sys
+import time
+import pandas as pd
+
+# Micro-benchmark: per-line classification + canonicalization over every line in the dataset,
+# comparing the original per-call re.search/re.sub code with the precompiled patterns.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from bert_extractor import HybridNERProcessor
+
+processor = HybridNERProcessor(load_model=False)
+
+# Legacy implementations (as they were before the patterns were precompiled)
+def legacy_line_type(s):
+    s = s.strip()
+    if processor.DEGREE.search(s) or (re.search(r"\b(University|College|School|Institute)\b", s, re.I) and processor.YEAR.search(s)):
+        return "studies"
+    if re.search(processor.COURSE_HINTS, s, re.I):
+        return "courses"
+    if re.search(processor.ROLE_WORDS + r".*,", s, re.I):
+        return "corporate"
+    if re.search(r"\b(University|College|School|Institute)\b", s, re.I):
+        return "university"
+    return "other"
+
+def legacy_canon(s):
+    import unicodedata
+    if not s:
+        return None
+    x = unicodedata.normalize("NFKC", s).lower().strip()
+    x = processor.NOISE.sub(" ", x)
+    x = processor.LEGAL_SUFFIX.sub("", x)
+    x = re.sub(r"\s*&\s*", " & ", x)
+    x = re.sub(r"\s{2,}", " ", x).strip().strip(",.")
+    return processor.ALIASES.get(x, x)
+
+# Load every line of the dataset
+df = pd.read_csv(os.path.join(ROOT, 'data/teachers_db_practice.csv'))
+lines = []
+for html in df['full_info']:
+    lines.extend(processor.extract_lines_from_html(html))
+print(f"Lines in dataset: {len(lines)}")
+
+# Same answers first
+mismatches = [l for l in lines if legacy_line_type(l) != processor.line_type(l)]
+print(f"Classification mismatches: {len(mismatches)}")
+mismatches = [l for l in lines if legacy_canon(l) != processor.canon(l)]
+print(f"Canon mismatches: {len(mismatches)}")
+
+def bench(fn, repeats=5):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for l in lines:
+            fn(l)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+print("-" * 50)
+for name, legacy, current in [
+    ("line_type", legacy_line_type, processor.line_type),
+    ("canon", legacy_canon, processor.canon),
+]:
+    t_old, t_new = bench(legacy), bench(current)
+    print(f"{name:<10} legacy {t_old*1000:8.1f} ms | compiled {t_new*1000:8.1f} ms | {t_old/t_new:4.2f}x")
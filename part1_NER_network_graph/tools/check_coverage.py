@@ -1,22 +1,25 @@
+import os
+import sys
 import pandas as pd
-import json
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from entity_merger import load_results, results_path
 
 # Load original dataset
 df = pd.read_csv('data/teachers_db_practice.csv')
 original_row_ids = set(df.index)
 
-# Load JSON results
-with open('gliner_entities_results.json', 'r') as f:
-    results = json.load(f)
+# Load GLiNER results saved by main.py (RESULTS_FORMAT matches its --results-format)
+results = load_results(results_path('results/gliner_entities_results', os.getenv("RESULTS_FORMAT", "jsonl")))
 
-# Extract row IDs from JSON
-json_row_ids = set(result['row_id'] for result in results)
+# Extract row IDs from the results
+json_row_ids = set(result['id'] for result in results)
 
 # Find missing row IDs
 missing_row_ids = original_row_ids - json_row_ids
 
 print(f"Original dataset rows: {len(original_row_ids)}")
-print(f"JSON results rows: {len(json_row_ids)}")
+print(f"Result rows: {len(json_row_ids)}")
 print(f"Coverage: {len(json_row_ids)}/{len(original_row_ids)} ({len(json_row_ids)/len(original_row_ids)*100:.1f}%)")
 
 if missing_row_ids:
@@ -1,7 +1,11 @@
-from gliner import GLiNER
+import os
+import sys
 
-model = GLiNER.from_pretrained("urchade/gliner_mediumv2.1")
-model.eval()
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gliner_service import get_gliner_backend
+
+# Reuse a running gliner_service.py worker (GLINER_SERVICE=host:port) to skip the model load
+model = get_gliner_backend(os.getenv("GLINER_SERVICE"))
 print("ok")
 
 text = """<p>Mr.  Madgar has been teaching economics part time while working in various professional roles across a wide array of industries.